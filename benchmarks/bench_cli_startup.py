@@ -0,0 +1,79 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# === CLI 啟動時間量測 ===
+# 用法：python benchmarks/bench_cli_startup.py [次數]
+# 量測 --help 與不需重量級模組的子命令說明頁，超過預算時以非零代碼結束。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+CLI = os.path.join(PROJECT_ROOT, "stock_cli.py")
+BUDGET_MS = 150
+HEAVY_MODULES = ("pandas", "numpy", "requests", "bs4", "selenium", "tqdm")
+
+CASES = [
+    ["--help"],
+    ["history", "--help"],
+    ["backfill", "--help"],
+    ["links", "--help"],
+]
+
+
+def time_case(argv, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI, *argv], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def time_case_python(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def heavy_modules_after_parse():
+    # 確認光是建立 parser 不會載入重量級模組
+    code = (
+        "import sys; sys.path.insert(0, %r); import stock_cli; stock_cli.build_parser(); "
+        "print(','.join(m for m in %r if m in sys.modules))" % (PROJECT_ROOT, HEAVY_MODULES)
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    # 先暖機一次，讓 .pyc 與檔案快取就緒
+    subprocess.run([sys.executable, CLI, "--help"], stdout=subprocess.DEVNULL, check=False)
+
+    baseline, _ = time_case_python(runs)
+    print(f"python 空啟動：median {baseline:.1f} ms")
+
+    failed = False
+    for argv in CASES:
+        median, best = time_case(argv, runs)
+        status = "OK" if median <= BUDGET_MS else "超過預算"
+        failed |= median > BUDGET_MS
+        print(f"stock_cli {' '.join(argv):<20} median {median:6.1f} ms  min {best:6.1f} ms  {status}")
+
+    loaded = heavy_modules_after_parse()
+    if loaded:
+        failed = True
+        print(f"❌ 建立 parser 時載入了重量級模組：{', '.join(loaded)}")
+    else:
+        print("✅ 建立 parser 未載入任何重量級模組")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import json
+import subprocess
+import sys
+import tempfile
+
+# === Excel 匯出吞吐量與記憶體量測 ===
+# 用法：python benchmarks/bench_export.py [--baseline]
+# 每個案例在獨立子行程中執行，回報列數、秒數、列/秒與峰值 RSS。
+# 以不同比例的股票數匯出，峰值記憶體的差距超過預算時以非零代碼結束（串流匯出應與列數無關）。
+# --baseline 另外量測「全部讀進 pandas 再 to_excel」的舊做法作為對照。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+MEMORY_GROWTH_BUDGET_MB = 64
+FRACTIONS = [0.25, 1.0]
+
+STREAM_CASE = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+from 資料分析 import excel_export
+from 資料分析.history_store import MARKETS, list_codes
+codes = [c for m in MARKETS for c in list_codes(m)]
+codes = codes[: int(len(codes) * {fraction})]
+start = time.perf_counter()
+rows = excel_export.export_history({path!r}, codes=codes)
+print(json.dumps({{"rows": rows, "seconds": time.perf_counter() - start,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+PARALLEL_CASE = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+from 資料分析 import excel_export
+jobs = excel_export.history_jobs({out_dir!r}, split_by="market")
+start = time.perf_counter()
+results = excel_export.run_jobs(jobs, workers={workers})
+rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+print(json.dumps({{"rows": sum(r["rows"] for r in results), "seconds": time.perf_counter() - start, "rss_mb": rss / 1024}}))
+"""
+
+BASELINE_CASE = """
+import sys, time, json, resource
+import pandas as pd
+sys.path.insert(0, {root!r})
+from 資料分析.history_store import MARKETS, load_histories
+start = time.perf_counter()
+frames = {{m: load_histories(m) for m in MARKETS}}
+with pd.ExcelWriter({path!r}) as writer:
+    for market, frame in frames.items():
+        frame.to_excel(writer, sheet_name=market, index=False)
+print(json.dumps({{"rows": sum(len(f) for f in frames.values()), "seconds": time.perf_counter() - start,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def run_case(code):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def report(label, result):
+    rate = result["rows"] / max(result["seconds"], 1e-9)
+    print(f"{label:<28} {result['rows']:>9,} 列  {result['seconds']:6.1f} 秒  {rate:>9,.0f} 列/秒  峰值 {result['rss_mb']:6.0f} MB")
+
+
+def main():
+    baseline = "--baseline" in sys.argv[1:]
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        peaks = []
+        for fraction in FRACTIONS:
+            path = os.path.join(tmp, f"stream_{fraction}.xlsx")
+            result = run_case(STREAM_CASE.format(root=PROJECT_ROOT, fraction=fraction, path=path))
+            report(f"串流匯出 {fraction:.0%} 股票", result)
+            peaks.append(result["rss_mb"])
+
+        growth = peaks[-1] - peaks[0]
+        if growth > MEMORY_GROWTH_BUDGET_MB:
+            failed = True
+            print(f"❌ 峰值記憶體隨資料量增加 {growth:.0f} MB（預算 {MEMORY_GROWTH_BUDGET_MB} MB）")
+        else:
+            print(f"✅ 峰值記憶體增加 {growth:.0f} MB，在預算 {MEMORY_GROWTH_BUDGET_MB} MB 內")
+
+        workers = os.cpu_count() or 1
+        for n in sorted({1, min(workers, 3)}):
+            out_dir = os.path.join(tmp, f"parallel_{n}")
+            result = run_case(PARALLEL_CASE.format(root=PROJECT_ROOT, out_dir=out_dir, workers=n))
+            report(f"依市場拆 3 本（{n} 行程）", result)
+
+        if baseline:
+            path = os.path.join(tmp, "baseline.xlsx")
+            try:
+                report("pandas to_excel（對照）", run_case(BASELINE_CASE.format(root=PROJECT_ROOT, path=path)))
+            except subprocess.CalledProcessError as e:
+                print(f"⚠️ 對照組無法執行（需要 openpyxl 或 xlsxwriter）：{e.stderr.strip().splitlines()[-1]}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
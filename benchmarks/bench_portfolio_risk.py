@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# === 投資組合 VaR / ES 批次計算量測 ===
+# 用法：python benchmarks/bench_portfolio_risk.py [組合數] [交易日數] [行程數]
+# 以隨機持股與隨機報酬量測 evaluate() 的耗時，並抽樣與逐部位迴圈的結果比對；
+# 超過預算或結果不一致時以非零代碼結束。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+from 資料分析.portfolio_risk import evaluate, portfolio_matrix  # noqa: E402
+
+BUDGET_SECONDS = 5.0
+N_CODES = 2400
+POSITIONS_RANGE = (5, 40)
+SAMPLE = 50
+
+
+def random_positions(rng, n_portfolios, codes):
+    rows = []
+    for p in range(n_portfolios):
+        k = rng.integers(*POSITIONS_RANGE)
+        for code in rng.choice(codes, k, replace=False):
+            rows.append((f"P{p:05d}", code, int(rng.integers(1, 50)) * 1000))
+    return pd.DataFrame(rows, columns=["portfolio", "code", "quantity"])
+
+
+def loop_var(positions, prices, returns, codes, level=0.99):
+    # 舊做法：逐部位累加損益
+    column = {code: i for i, code in enumerate(codes)}
+    pnl = np.zeros(returns.shape[0])
+    for code, quantity in zip(positions["code"], positions["quantity"]):
+        i = column[code]
+        pnl += quantity * prices[i] * returns[:, i]
+    losses = np.sort(-pnl)
+    return losses[int(np.ceil(level * len(losses))) - 1]
+
+
+def main():
+    n_portfolios = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+
+    rng = np.random.default_rng(0)
+    codes = [f"{i:04d}" for i in range(N_CODES)]
+    positions = random_positions(rng, n_portfolios, codes)
+    prices = rng.uniform(10, 500, N_CODES)
+    returns = rng.normal(0, 0.02, (days, N_CODES))
+
+    start = time.perf_counter()
+    ids, quantities, _ = portfolio_matrix(positions, codes)
+    metrics = evaluate(quantities, prices, returns, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"{n_portfolios:,} 個組合 x {days} 日（{len(positions):,} 個部位，{workers} 行程）：{elapsed:.2f} 秒")
+
+    sample = rng.choice(len(ids), min(SAMPLE, len(ids)), replace=False)
+    grouped = positions.groupby("portfolio")
+    loop_start = time.perf_counter()
+    expected = [loop_var(grouped.get_group(ids[i]), prices, returns, codes) for i in sample]
+    loop_elapsed = (time.perf_counter() - loop_start) / len(sample) * n_portfolios
+    print(f"逐部位迴圈（由 {len(sample)} 組推估）：{loop_elapsed:.1f} 秒")
+
+    failed = False
+    if not np.allclose(metrics["var_99"][sample], expected, rtol=1e-9):
+        failed = True
+        print("❌ VaR 與逐部位迴圈結果不一致")
+    else:
+        print("✅ 抽樣 VaR 與逐部位迴圈一致")
+    if elapsed > BUDGET_SECONDS:
+        failed = True
+        print(f"❌ 超過預算 {BUDGET_SECONDS:.0f} 秒")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
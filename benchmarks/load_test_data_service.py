@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+import threading
+import http.client
+
+# === 資料服務壓力測試 ===
+# 用法：python benchmarks/load_test_data_service.py [--url http://127.0.0.1:8765] [--threads 8] [--seconds 10]
+# 沒有指定 --url 時自動在隨機埠啟動一個服務。每個執行緒用 keep-alive 連線反覆請求，
+# 混合單檔歷史、全市場截面與報價三種端點；第二輪帶 If-None-Match，量測 304 路徑。
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def start_server():
+    port = random.randint(20000, 40000)
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, "資料分析", "data_service.py"), "--port", str(port), "--warm"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    # 等到服務印出啟動訊息
+    for line in proc.stdout:
+        if "資料服務啟動" in line:
+            break
+    return proc, f"127.0.0.1:{port}"
+
+
+def sample_paths(address, count=200):
+    from 資料分析.history_store import list_codes
+
+    codes = list_codes("listed")[:count] + list_codes("otc")[:count // 2]
+    # 以第一檔的最近 20 個交易日作為截面查詢的日期
+    conn = http.client.HTTPConnection(address)
+    conn.request("GET", f"/history/{codes[0]}")
+    rows = json.loads(conn.getresponse().read())["data"]
+    dates = [row[0] for row in rows[-20:]]
+    paths = [f"/history/{code}?start=2025-01-01" for code in codes]
+    paths += [f"/cross-section/{date}" for date in dates]
+    paths += ["/quotes", "/quotes?market=otc", f"/history/{codes[0]}?format=arrow"]
+    return paths
+
+
+def worker(address, paths, deadline, revalidate, latencies, counts, lock):
+    conn = http.client.HTTPConnection(address)
+    etags = {}
+    local, statuses = [], {}
+    rng = random.Random(threading.get_ident())
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        headers = {"Accept-Encoding": "gzip"}
+        if revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        res = conn.getresponse()
+        res.read()
+        local.append(time.perf_counter() - start)
+        statuses[res.status] = statuses.get(res.status, 0) + 1
+        if res.getheader("ETag"):
+            etags[path] = res.getheader("ETag")
+    with lock:
+        latencies.extend(local)
+        for status, n in statuses.items():
+            counts[status] = counts.get(status, 0) + n
+
+
+def run(address, paths, threads, seconds, revalidate):
+    latencies, counts, lock = [], {}, threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(address, paths, deadline, revalidate, latencies, counts, lock))
+        for _ in range(threads)
+    ]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    label = "帶 If-None-Match" if revalidate else "一般請求"
+    print(f"{label:<16} {len(latencies) / elapsed:8,.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  狀態 {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="資料服務壓力測試")
+    parser.add_argument("--url", help="既有服務位址，例如 http://127.0.0.1:8765")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        address = args.url.split("://")[-1].rstrip("/")
+    else:
+        proc, address = start_server()
+    try:
+        paths = sample_paths(address)
+        # 暖機：每個路徑先請求一次，之後量測的是快取命中的路徑
+        conn = http.client.HTTPConnection(address)
+        for path in paths:
+            conn.request("GET", path)
+            conn.getresponse().read()
+        run(address, paths, args.threads, args.seconds, False)
+        run(address, paths, args.threads, args.seconds, True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
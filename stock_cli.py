@@ -0,0 +1,139 @@
+import argparse
+import importlib
+import os
+import sys
+
+# 這支入口只依賴標準函式庫；pandas / selenium / bs4 等重量級模組
+# 都在子命令真正執行時才由對應的爬蟲模組載入，--help 不會付出載入成本。
+
+# === 路徑設定 ===
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# === 子命令對應的模組 ===
+HISTORY_MODULES = {
+    "listed": "讀取歷史價格.fetch_list_company_number_day_price_information",
+    "otc": "讀取歷史價格.fetch_over_the_encounter_day_price",
+    "emerging": "讀取歷史價格.fetch_emerging_stock_market_day_price",
+}
+
+BACKFILL_MODULES = {
+    "year": "讀取歷史價格.fetch_each_stock_year_price_information",
+    "month": "讀取歷史價格.fetch_each_stock_month_price_information",
+}
+
+ANALYSIS_MODULES = {
+    "corr": "資料分析.rolling_correlation",
+    "aggregates": "資料分析.market_aggregates",
+    "adjust": "資料分析.adjusted_prices",
+    "changes": "共用工具.changelog",
+    "export": "資料分析.excel_export",
+    "risk": "資料分析.portfolio_risk",
+    "serve": "資料分析.data_service",
+    "symbols": "資料分析.symbol_index",
+}
+
+MASTER_FILES = [
+    "list_company_number.csv",
+    "over_the_counter_number.csv",
+    "emerging_stock_market.csv",
+]
+
+
+def load(module_name):
+    return importlib.import_module(module_name)
+
+
+# === 子命令實作 ===
+def cmd_universe(args):
+    load("讀取股票基本資訊.fetch_stock_number").main()
+
+
+def cmd_links(args):
+    load("讀取股票基本資訊.fetch_each_stock_link").main(args.files)
+
+
+def cmd_quotes(args):
+    load("讀取股票基本資訊.fetch_each_stock_price").main(args.files)
+
+
+def cmd_history(args):
+    load(HISTORY_MODULES[args.market]).main(full=args.all)
+
+
+def cmd_backfill(args):
+    # 其餘參數原封不動交給回補模組自己的 argparse 處理
+    load(BACKFILL_MODULES[args.level]).main(args.options)
+
+
+def cmd_analysis(args):
+    load(ANALYSIS_MODULES[args.command]).main(args.options)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="stock_cli", description="台灣股市資料擷取工具")
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+    sub.required = True
+
+    p = sub.add_parser("universe", help="從證交所 ISIN 頁面更新上市、上櫃、興櫃股票清單")
+    p.set_defaults(func=cmd_universe)
+
+    p = sub.add_parser("links", help="在股票清單補上鉅亨網網址")
+    p.add_argument("--files", nargs="*", choices=MASTER_FILES, help="只處理指定清單檔")
+    p.set_defaults(func=cmd_links)
+
+    p = sub.add_parser("quotes", help="抓取最新報價寫回股票清單")
+    p.add_argument("--files", nargs="*", choices=MASTER_FILES, help="只處理指定清單檔")
+    p.set_defaults(func=cmd_quotes)
+
+    p = sub.add_parser("history", help="抓取近一年日成交資訊")
+    p.add_argument("market", choices=sorted(HISTORY_MODULES))
+    p.add_argument("--all", action="store_true", help="忽略流動性排程，所有股票都抓")
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("backfill", help="以年/月彙總端點回補多年歷史（其餘參數見 backfill <level> --help）")
+    p.add_argument("level", choices=sorted(BACKFILL_MODULES))
+    p.add_argument("options", nargs=argparse.REMAINDER)
+    p.set_defaults(func=cmd_backfill)
+
+    # 分析類子命令的參數全部交給模組自己的 argparse（含 --help）
+    p = sub.add_parser("corr", help="全市場滾動報酬相關係數（其餘參數見 corr --help）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("aggregates", help="產業別 / 市場別每日彙總（update 或 query）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("adjust", help="除權息還原因子與還原價（update、import 或 show）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("export", help="串流匯出 Excel 報表（history 或 universe）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("risk", help="批次投資組合市值與歷史模擬 VaR / ES（參數見 risk --help）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("serve", help="啟動本機唯讀資料服務（HTTP，參數見 serve --help）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("symbols", help="股票代號 / 名稱搜尋（find 或 update）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    p = sub.add_parser("changes", help="爬蟲寫檔的異動紀錄（tail 或 export）", add_help=False)
+    p.set_defaults(func=cmd_analysis, passthrough=True)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if getattr(args, "passthrough", False):
+        args.options = rest
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+from 資料分析 import data_service  # noqa: E402
+
+
+def fake_history(market, codes=None):
+    # 每個市場一檔，重新載入時多一天，讓新舊版本的 dates 位置不同
+    fake_history.calls += 1
+    days = pd.bdate_range("2025-08-01", periods=5 + fake_history.calls)
+    return pd.DataFrame({"code": f"{market[:2]}01", "date": days, "close": 10.0})
+
+
+def test_cross_section_slices_consistent_snapshot(monkeypatch):
+    fake_history.calls = 0
+    monkeypatch.setattr(data_service, "load_histories", fake_history)
+    store = data_service.CrossSectionStore()
+    date = pd.Timestamp("2025-08-05")
+
+    # 模擬 on() 取得快照之後、切片之前，爬蟲異動觸發重建
+    frame, dates = store.frame()
+    store.invalidate("listed", {"li01"})
+    store.frame()
+    lo = dates.searchsorted(date.to_datetime64(), side="left")
+    hi = dates.searchsorted(date.to_datetime64(), side="right")
+    assert len(frame.iloc[lo:hi]) == len(data_service.MARKETS)
+    assert len(store.on(date)) == len(data_service.MARKETS)
+
+
+@pytest.mark.parametrize("path", ["/history/0050", "/quotes", "/cross-section/2025-08-22"])
+def test_unknown_market_is_bad_request(path):
+    service = data_service.DataService(watch=False)
+    with pytest.raises(data_service.BadRequest):
+        service.payload(path, {"market": "bogus"})
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+from 讀取歷史價格 import (  # noqa: E402
+    fetch_each_stock_month_price_information as month_backfill,
+    fetch_emerging_stock_market_day_price as emerging,
+    fetch_list_company_number_day_price_information as listed,
+    fetch_over_the_encounter_day_price as otc,
+)
+
+# === 日成交爬蟲的月份推算 ===
+# backfill_daily 把整段區間一次交給日成交爬蟲；區間跨越多個年度時，每個月份都要是合法日期。
+
+START_YM, END_YM = "2021-11", "2024-06"
+EXPECTED = (
+    [(2024, m) for m in range(6, 0, -1)]
+    + [(year, m) for year in (2023, 2022) for m in range(12, 0, -1)]
+    + [(2021, 12), (2021, 11)]
+)
+
+
+class EmptyResponse:
+    def json(self):
+        return {"data": [], "tables": [{"fields": [], "data": []}]}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(listed.time, "sleep", lambda seconds: None)
+
+
+def test_month_count_spans_years():
+    assert month_backfill.month_count(START_YM, END_YM) == len(EXPECTED)
+
+
+def test_twse_requests_every_month(tmp_path, monkeypatch):
+    requested = []
+    monkeypatch.setattr(listed, "SAVE_DIR", str(tmp_path))
+    monkeypatch.setattr(listed, "safe_get", lambda url: requested.append(url) or EmptyResponse())
+
+    months = month_backfill.month_count(START_YM, END_YM)
+    assert listed.fetch_twse_stock("0050", 2024, 6, months=months) == months
+    dates = [url.split("date=")[1][:8] for url in requested]
+    assert dates == [f"{y}{m:02d}01" for y, m in EXPECTED]
+
+
+@pytest.mark.parametrize("module, fetch", [
+    (otc, otc.fetch_tpex_stock),
+    (emerging, emerging.fetch_emerging_stock),
+])
+def test_tpex_requests_every_month(tmp_path, monkeypatch, module, fetch):
+    requested = []
+    monkeypatch.setattr(module, "SAVE_DIR", str(tmp_path))
+    monkeypatch.setattr(module, "safe_post", lambda url, headers, data: requested.append(data["date"]) or EmptyResponse())
+
+    months = month_backfill.month_count(START_YM, END_YM)
+    # 櫃買與興櫃爬蟲吃民國年
+    assert fetch("1234", 2024 - 1911, 6, months=months) == months
+    assert requested == [f"{y}/{m:02d}/01" for y, m in EXPECTED]
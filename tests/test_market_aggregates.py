@@ -0,0 +1,111 @@
+import os
+import sys
+import csv
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+from 資料分析 import history_store, market_aggregates  # noqa: E402
+
+# === 增量更新與整批重建必須一致 ===
+# 以合成的上市日成交檔測試：先建好彙總，再在已計入的範圍內補進缺漏的日子或改寫價格，
+# 增量更新的結果要與整批重建完全相同。
+
+HEADER = ["日期", "成交股數", "成交金額", "開盤價", "最高價", "最低價", "收盤價", "漲跌價差", "成交筆數"]
+STOCKS = {"1101": "水泥工業", "1102": "水泥工業", "2303": "半導體業", "2330": "半導體業"}
+DAYS = pd.bdate_range("2025-01-02", periods=60)
+
+
+def make_rows(code, seed):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.cumprod(1 + rng.normal(0, 0.02, len(DAYS)))
+    volume = rng.integers(1_000, 50_000, len(DAYS)) * 1000
+    rows = []
+    for day, price, shares in zip(DAYS, close, volume):
+        roc = f"{day.year - 1911}/{day.month:02d}/{day.day:02d}"
+        price = round(float(price), 2)
+        rows.append([roc, f"{shares:,}", f"{int(shares * price):,}", price, price, price, price, "0.00", "100"])
+    return rows[::-1]  # 檔案內由新到舊
+
+
+def write_history(folder, code, rows):
+    with open(os.path.join(folder, f"{code}.csv"), "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    folder = tmp_path / "data"
+    history = folder / history_store.MARKETS["listed"]["dir"]
+    history.mkdir(parents=True)
+    with open(folder / history_store.MARKETS["listed"]["master"], "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["股票代號", "股票名稱", "市場別", "產業別"])
+        writer.writerows([code, code, "上市", industry] for code, industry in STOCKS.items())
+    monkeypatch.setattr(history_store, "DATA_DIR", str(folder))
+    monkeypatch.setattr(market_aggregates, "SHARES_PATH", str(folder / "shares_outstanding.csv"))
+    use_agg_dir(monkeypatch, folder / "aggregates")
+    return folder, str(history)
+
+
+def use_agg_dir(monkeypatch, folder):
+    monkeypatch.setattr(market_aggregates, "AGG_DIR", str(folder))
+    monkeypatch.setattr(market_aggregates, "STATE_PATH", str(folder / "state.json"))
+
+
+def read_views():
+    return {view: market_aggregates.read_view(view).sort_index() for view in market_aggregates.VIEWS}
+
+
+def assert_matches_rebuild(monkeypatch, folder):
+    incremental = read_views()
+    use_agg_dir(monkeypatch, folder / "aggregates_rebuild")
+    market_aggregates.update(rebuild=True)
+    for view, expected in read_views().items():
+        pd.testing.assert_frame_equal(incremental[view], expected, check_dtype=False, rtol=1e-9)
+
+
+def test_gap_fill_matches_rebuild(data_dir, monkeypatch):
+    folder, history = data_dir
+    full = {code: make_rows(code, seed) for seed, code in enumerate(STOCKS)}
+    for code, rows in full.items():
+        # 前兩檔中間缺了 15 天，之後由回補程式補上
+        write_history(history, code, rows[:20] + rows[35:] if code in ("1101", "2303") else rows)
+    market_aggregates.update(rebuild=True)
+
+    for code in ("1101", "2303"):
+        write_history(history, code, full[code])
+    market_aggregates.update()
+    assert_matches_rebuild(monkeypatch, folder)
+
+
+def test_revised_price_matches_rebuild(data_dir, monkeypatch):
+    folder, history = data_dir
+    full = {code: make_rows(code, seed) for seed, code in enumerate(STOCKS)}
+    for code, rows in full.items():
+        write_history(history, code, rows)
+    market_aggregates.update(rebuild=True)
+
+    revised = [list(row) for row in full["1102"]]
+    revised[30][6] = round(float(revised[30][6]) * 1.1, 2)
+    write_history(history, "1102", revised)
+    market_aggregates.update()
+    assert_matches_rebuild(monkeypatch, folder)
+
+
+def test_append_and_prepend_match_rebuild(data_dir, monkeypatch):
+    folder, history = data_dir
+    full = {code: make_rows(code, seed) for seed, code in enumerate(STOCKS)}
+    for code, rows in full.items():
+        write_history(history, code, rows[5:50])
+    market_aggregates.update(rebuild=True)
+
+    for code, rows in full.items():
+        write_history(history, code, rows)
+    market_aggregates.update()
+    assert_matches_rebuild(monkeypatch, folder)
@@ -0,0 +1,231 @@
+import os
+import csv
+import json
+import atexit
+import argparse
+import threading
+from datetime import datetime
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+CHANGELOG_DIR = os.path.join(DATA_DIR, "changelog")
+CHECKPOINT_DIR = os.path.join(CHANGELOG_DIR, "checkpoints")
+
+
+# === 異動紀錄（每次執行一個 NDJSON 區段） ===
+# 每筆紀錄：{"run", "seq", "ts", "source", "table", "op", "key", "row"}
+#   table 為相對於 data/ 的檔案路徑（不含 .csv），key 為第一欄（或前幾欄以 / 串接）的值，row 為整列內容。
+# 區段檔名以執行開始時間開頭，依檔名排序即為執行順序；結束時寫入 op=commit 的紀錄。
+class ChangeLog:
+    def __init__(self, run_id: str = None, directory: str = None):
+        self.directory = directory or CHANGELOG_DIR
+        self.run_id = run_id or f"{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+        self.path = os.path.join(self.directory, f"{self.run_id}.ndjson")
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self.closed = False
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def emit(self, source: str, table: str, op: str, key=None, row=None):
+        with self._lock:
+            if self.closed:
+                raise RuntimeError(f"changelog {self.run_id} 已關閉")
+            self._seq += 1
+            record = {
+                "run": self.run_id,
+                "seq": self._seq,
+                "ts": datetime.now().isoformat(timespec="milliseconds"),
+                "source": source,
+                "table": table,
+                "op": op,
+                "key": key,
+                "row": row,
+            }
+            f = self._open()
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            return self._seq
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            # 沒有任何異動就不留下空區段
+            if self._file is not None:
+                self._seq += 1
+                record = {"run": self.run_id, "seq": self._seq, "ts": datetime.now().isoformat(timespec="milliseconds"), "op": "commit"}
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.close()
+            self.closed = True
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def current_log() -> ChangeLog:
+    # 同一個行程內所有爬蟲共用一個區段，行程結束時自動寫入 commit
+    global _current
+    with _current_lock:
+        if _current is None or _current.closed:
+            _current = ChangeLog()
+            atexit.register(_current.close)
+        return _current
+
+
+# === 檔案異動比對 ===
+def table_name(path: str) -> str:
+    relative = os.path.relpath(os.path.abspath(path), DATA_DIR)
+    return os.path.splitext(relative)[0].replace(os.sep, "/")
+
+
+def snapshot(path: str, key_columns: int = 1) -> dict:
+    # 以前 key_columns 欄（日期、股票代號，或月彙總的年度 + 月份）為鍵，記下每一列的原始字串
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return {}
+        return {"/".join(row[:key_columns]): dict(zip(header, row)) for row in reader if row}
+
+
+def emit_file_changes(path: str, before: dict, source: str, key_columns: int = 1, log: ChangeLog = None) -> int:
+    # 寫檔後呼叫：與寫入前的快照比對，只送出新增或內容有變的列
+    after = snapshot(path, key_columns)
+    log = log or current_log()
+    table = table_name(path)
+    count = 0
+    for key, row in after.items():
+        old = before.get(key)
+        if old == row:
+            continue
+        log.emit(source, table, "insert" if old is None else "update", key, row)
+        count += 1
+    return count
+
+
+# === 消費端：從檢查點接續讀取 ===
+# 檢查點記錄每個區段已讀到的位元組位置；已 commit 且讀完的區段之後不再開啟，
+# 因此每次讀取的成本只跟新增的紀錄數有關。
+class ChangeFeed:
+    def __init__(self, consumer: str, directory: str = None):
+        self.consumer = consumer
+        self.directory = directory or CHANGELOG_DIR
+        self.checkpoint_path = os.path.join(self.directory, "checkpoints", f"{consumer}.json")
+        self._state = self._load()
+        self._pending = None
+
+    def _load(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {"offsets": {}, "done": []}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        done = set(self._state["done"])
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".ndjson"))
+        return [name[:-7] for name in names if name[:-7] not in done]
+
+    def read(self, limit: int = None):
+        # 回傳檢查點之後的紀錄（不含 commit）；呼叫 commit() 後檢查點才前進
+        offsets = dict(self._state["offsets"])
+        done = list(self._state["done"])
+        records = []
+        for run_id in self.segments():
+            path = os.path.join(self.directory, f"{run_id}.ndjson")
+            with open(path, "rb") as f:
+                f.seek(offsets.get(run_id, 0))
+                while limit is None or len(records) < limit:
+                    line = f.readline()
+                    # 寫到一半的最後一列先不讀，下次再接續
+                    if not line.endswith(b"\n"):
+                        break
+                    offsets[run_id] = f.tell()
+                    record = json.loads(line)
+                    if record["op"] == "commit":
+                        done.append(run_id)
+                        offsets.pop(run_id, None)
+                        break
+                    records.append(record)
+            if limit is not None and len(records) >= limit:
+                break
+        self._pending = {"offsets": offsets, "done": done}
+        return records
+
+    def commit(self):
+        if self._pending is None:
+            return
+        self._state = self._pending
+        self._pending = None
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(tmp, self.checkpoint_path)
+
+
+# === Arrow IPC 輸出（選用，需安裝 pyarrow） ===
+def export_arrow(run_id: str, directory: str = None) -> str:
+    import pyarrow as pa
+
+    directory = directory or CHANGELOG_DIR
+    source = os.path.join(directory, f"{run_id}.ndjson")
+    target = os.path.join(directory, f"{run_id}.arrow")
+    columns = {name: [] for name in ["run", "seq", "ts", "source", "table", "op", "key", "row"]}
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["op"] == "commit":
+                continue
+            for name in columns:
+                value = record.get(name)
+                columns[name].append(json.dumps(value, ensure_ascii=False) if name == "row" else value)
+
+    table = pa.table(columns)
+    with pa.OSFile(target, "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return target
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="爬蟲寫檔的異動紀錄（CDC）：讀取、輸出 Arrow")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    p = sub.add_parser("tail", help="列出某個消費端檢查點之後的異動")
+    p.add_argument("--consumer", default="cli")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--commit", action="store_true", help="讀完後推進檢查點")
+
+    p = sub.add_parser("export", help="把一次執行的區段轉成 Arrow IPC 檔")
+    p.add_argument("run_id")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "export":
+        print(f"✅ 已輸出：{export_arrow(args.run_id)}")
+        return
+    feed = ChangeFeed(args.consumer)
+    records = feed.read(args.limit)
+    for record in records:
+        print(f"{record['run']} #{record['seq']} {record['op']:<6} {record['table']} {record['key']}")
+    print(f"共 {len(records)} 筆異動")
+    if args.commit:
+        feed.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# === 共用請求頻率限制 ===
+# 同一個交易所主機的所有請求（不論來自哪個執行緒或哪支爬蟲）共用同一個限制器，
+# 多執行緒平行抓取時總請求頻率仍維持在原本單執行緒 + sleep 的水準。
+class RateLimiter:
+    def __init__(self, min_interval: float, jitter: float = 0.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        # 先在鎖內預約下一個可用時段，再在鎖外睡眠，避免執行緒互相卡住
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time)
+            self._next_time = slot + self.min_interval + random.uniform(0, self.jitter)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# 證交所：原本單執行緒每次請求後 sleep 3 秒
+TWSE_LIMITER = RateLimiter(min_interval=3.0)
+# 櫃買中心：原本 2 個執行緒、每次請求後 sleep 1.0~1.5 秒，加上回應時間合計約每秒 1.3 次；
+# 平均間隔 0.8 秒（每秒 1.25 次），不論回補開幾個執行緒都不超過原本的頻率
+TPEX_LIMITER = RateLimiter(min_interval=0.7, jitter=0.2)
+
+_LIMITERS_LOCK = threading.Lock()
+_LIMITERS = {
+    "www.twse.com.tw": TWSE_LIMITER,
+    "www.tpex.org.tw": TPEX_LIMITER,
+}
+
+
+def limiter_for(url: str) -> RateLimiter:
+    host = urlparse(url).netloc
+    with _LIMITERS_LOCK:
+        if host not in _LIMITERS:
+            # 未知主機給一個保守的獨立限制器
+            _LIMITERS[host] = RateLimiter(min_interval=1.0)
+        return _LIMITERS[host]
+
+
+def throttle(url: str):
+    limiter_for(url).wait()
+
+
+def set_min_interval(url: str, min_interval: float, jitter: float = None):
+    # 調整某個主機的請求間隔（例如回補時放慢）；url 可以是完整網址或主機名稱
+    limiter = limiter_for(url if "://" in url else f"https://{url}")
+    with limiter._lock:
+        limiter.min_interval = min_interval
+        if jitter is not None:
+            limiter.jitter = jitter
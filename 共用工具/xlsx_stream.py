@@ -0,0 +1,220 @@
+import os
+import re
+import zipfile
+import tempfile
+from xml.sax.saxutils import escape
+
+# === 串流 xlsx 寫入器 ===
+# 每張工作表的 <sheetData> 逐列寫進各自的暫存檔，close() 時才依序串流壓縮進 zip，
+# 記憶體只保留目前這一列，與總列數無關。
+# 只支援匯出報表需要的部分：文字（inline string）、數字、少數固定格式、凍結表頭與欄寬。
+# 逐格呼叫 API 的成本太高，因此由呼叫端直接組好整列的 XML（見 cell_string / cell_number）。
+
+SHEET_ROW_LIMIT = 1_048_576
+
+# 儲存格格式編號（對應下方 STYLES_XML 的 cellXfs 順序）
+STYLE_DEFAULT = 0
+STYLE_HEADER = 1
+STYLE_DATE = 2
+STYLE_INT = 3
+STYLE_PRICE = 4
+STYLE_PERCENT = 5
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+STYLES_XML = (
+    XML_DECL
+    + f'<styleSheet xmlns="{MAIN_NS}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy/mm/dd"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="新細明體"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><name val="新細明體"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="6">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="3" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="2" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="10" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="一般" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def column_letter(index: int) -> str:
+    # 0 -> A, 25 -> Z, 26 -> AA
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def cell_string(ref: str, text: str) -> str:
+    # text 需已經 escape（重複出現的字串可由呼叫端先 escape 一次再重用）
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def cell_number(ref: str, value, style: int = STYLE_DEFAULT) -> str:
+    return f'<c r="{ref}" s="{style}"><v>{value!r}</v></c>'
+
+
+class StreamSheet:
+    def __init__(self, title: str, widths, tmpdir=None):
+        self.title = title
+        self.widths = list(widths)
+        self.rows = 0
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8", dir=tmpdir)
+        self.letters = [column_letter(i) for i in range(max(len(self.widths), 1))]
+
+    def next_row(self) -> int:
+        # 回傳 Excel 的列號（從 1 開始）
+        if self.rows >= SHEET_ROW_LIMIT:
+            raise ValueError(f"工作表 {self.title} 已超過 {SHEET_ROW_LIMIT} 列")
+        self.rows += 1
+        return self.rows
+
+    def write_row_xml(self, row: int, cells_xml: str):
+        self.file.write(f'<row r="{row}">{cells_xml}</row>')
+
+    def write_header(self, header):
+        row = self.next_row()
+        cells = "".join(
+            f'<c r="{column_letter(col)}{row}" s="{STYLE_HEADER}" t="inlineStr"><is><t>{escape(str(name))}</t></is></c>'
+            for col, name in enumerate(header)
+        )
+        self.write_row_xml(row, cells)
+
+    def _head(self) -> str:
+        cols = "".join(
+            f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>' for i, width in enumerate(self.widths, start=1)
+        )
+        return (
+            XML_DECL
+            + f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+            '<sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            '</sheetView></sheetViews>'
+            '<sheetFormatPr defaultRowHeight="15"/>'
+            + (f"<cols>{cols}</cols>" if cols else "")
+            + "<sheetData>"
+        )
+
+    def copy_into(self, sink):
+        sink.write(self._head().encode("utf-8"))
+        self.file.seek(0)
+        while True:
+            block = self.file.read(1 << 20)
+            if not block:
+                break
+            sink.write(block.encode("utf-8"))
+        sink.write(b"</sheetData></worksheet>")
+        self.file.close()
+
+
+class XlsxStreamWriter:
+    def __init__(self, path: str, compresslevel: int = 1, tmpdir=None):
+        self.path = path
+        self.compresslevel = compresslevel
+        self.tmpdir = tmpdir
+        self.sheets = []
+        self._titles = set()
+
+    def sheet_title(self, name: str) -> str:
+        # 工作表名稱最多 31 字、不可含 []:*?/\ 且不分大小寫不可重複
+        base = re.sub(r"[\[\]:*?/\\]", "_", name).strip("'") or "Sheet"
+        title = base[:31]
+        n = 2
+        while title.lower() in self._titles:
+            suffix = f" ({n})"
+            title = base[:31 - len(suffix)] + suffix
+            n += 1
+        self._titles.add(title.lower())
+        return title
+
+    def add_sheet(self, name: str, header=None, widths=None) -> StreamSheet:
+        widths = widths or [10] * len(header or [])
+        sheet = StreamSheet(self.sheet_title(name), widths, self.tmpdir)
+        if header:
+            sheet.write_header(header)
+        self.sheets.append(sheet)
+        return sheet
+
+    def close(self):
+        if not self.sheets:
+            self.add_sheet("Sheet1")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel) as zf:
+            zf.writestr("[Content_Types].xml", self._content_types())
+            zf.writestr("_rels/.rels", self._root_rels())
+            zf.writestr("xl/workbook.xml", self._workbook())
+            zf.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels())
+            zf.writestr("xl/styles.xml", STYLES_XML)
+            for i, sheet in enumerate(self.sheets, start=1):
+                with zf.open(f"xl/worksheets/sheet{i}.xml", "w", force_zip64=True) as sink:
+                    sheet.copy_into(sink)
+        os.replace(tmp, self.path)
+
+    def discard(self):
+        for sheet in self.sheets:
+            sheet.file.close()
+
+    def _content_types(self) -> str:
+        sheets = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(self.sheets) + 1)
+        )
+        return (
+            XML_DECL
+            + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + sheets
+            + "</Types>"
+        )
+
+    def _root_rels(self) -> str:
+        return (
+            XML_DECL
+            + f'<Relationships xmlns="{PKG_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        )
+
+    def _workbook(self) -> str:
+        sheets = "".join(
+            f'<sheet name="{escape(sheet.title, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, sheet in enumerate(self.sheets, start=1)
+        )
+        return (
+            XML_DECL
+            + f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+            '<bookViews><workbookView/></bookViews>'
+            f"<sheets>{sheets}</sheets></workbook>"
+        )
+
+    def _workbook_rels(self) -> str:
+        rels = "".join(
+            f'<Relationship Id="rId{i}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, len(self.sheets) + 1)
+        )
+        styles_id = len(self.sheets) + 1
+        return (
+            XML_DECL
+            + f'<Relationships xmlns="{PKG_REL_NS}">{rels}'
+            f'<Relationship Id="rId{styles_id}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        )
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import threading
+from datetime import datetime
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+STATE_DIR = os.path.join(PROJECT_ROOT, "data", "crawl_state")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 資料分析.history_store import list_codes, load_histories, load_universe
+
+# === 排程參數 ===
+LOOKBACK_DAYS = 20              # 以最近幾筆交易紀錄計算平均成交金額
+ACTIVE_TURNOVER = 10_000_000    # 日均成交金額（元）達此門檻視為活躍股，每次都抓
+THIN_CADENCE_DAYS = 7           # 成交清淡的股票每隔幾天才重抓
+DORMANT_CADENCE_DAYS = 30       # 幾乎沒有成交的股票每隔幾天才重抓
+
+TIER_ORDER = ["new", "active", "thin", "dormant"]
+
+
+# === 爬取紀錄 ===
+def state_path(market: str) -> str:
+    return os.path.join(STATE_DIR, f"{market}.json")
+
+
+def load_crawl_state(market: str) -> dict:
+    path = state_path(market)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# === 流動性評分 ===
+def liquidity_table(market: str, codes) -> pd.DataFrame:
+    # 以正規化後的歷史資料（櫃買的張、仟元已換成股、元）計算近期成交金額與成交天數
+    codes = list(dict.fromkeys(str(code).strip() for code in codes))
+    stored = set(list_codes(market))
+    history = load_histories(market, [code for code in codes if code in stored])
+
+    table = pd.DataFrame(index=pd.Index(codes, name="code"))
+    if history.empty:
+        table["avg_turnover"] = 0.0
+        table["traded_days"] = 0
+    else:
+        recent = history.groupby("code", sort=False).tail(LOOKBACK_DAYS)
+        by_code = recent.groupby("code")
+        table["avg_turnover"] = by_code["turnover"].mean()
+        table["traded_days"] = (recent["volume"] > 0).groupby(recent["code"]).sum()
+        table["avg_turnover"] = table["avg_turnover"].fillna(0.0)
+        table["traded_days"] = table["traded_days"].fillna(0).astype(int)
+    table["has_history"] = table.index.isin(stored)
+
+    # 股票清單上的報價欄位：「-」或空白表示最近沒有成交價
+    universe = load_universe([market]).set_index("股票代號")
+    if "價格" in universe.columns:
+        price = universe["價格"].reindex(table.index).fillna("").str.strip()
+        table["no_quote"] = price.isin(["", "-", "--"])
+    else:
+        table["no_quote"] = False
+    return table
+
+
+def classify(row) -> str:
+    if not row["has_history"]:
+        return "new"
+    if row["traded_days"] == 0 or (row["no_quote"] and row["avg_turnover"] < ACTIVE_TURNOVER):
+        return "dormant"
+    if row["avg_turnover"] >= ACTIVE_TURNOVER:
+        return "active"
+    return "thin"
+
+
+# === 排程結果 ===
+class CrawlPlan:
+    def __init__(self, market: str, codes, table: pd.DataFrame, skipped):
+        self.market = market
+        self.codes = codes
+        self.table = table
+        self.skipped = skipped
+        self._state = load_crawl_state(market)
+        self._lock = threading.Lock()
+
+    def mark_done(self, code: str):
+        with self._lock:
+            self._state[str(code)] = datetime.now().isoformat(timespec="seconds")
+
+    def save(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp = state_path(self.market) + ".tmp"
+        with self._lock, open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=0)
+        os.replace(tmp, state_path(self.market))
+
+    def summary(self) -> str:
+        counts = self.table.loc[self.codes, "tier"].value_counts()
+        parts = [f"{tier} {int(counts.get(tier, 0))}" for tier in TIER_ORDER]
+        return f"本次抓取 {len(self.codes)} 檔（{'、'.join(parts)}），延後 {len(self.skipped)} 檔"
+
+
+def plan_crawl(market: str, codes, now=None, full: bool = False) -> CrawlPlan:
+    # 排序：新股票（還沒有歷史檔）→ 活躍股（成交金額大到小）→ 到期的清淡股 → 到期的冷門股。
+    # 清淡、冷門股依上次抓取時間決定是否本次處理。
+    now = now or datetime.now()
+    table = liquidity_table(market, codes)
+    table["tier"] = table.apply(classify, axis=1)
+
+    crawled = load_crawl_state(market)
+    last_crawled = pd.to_datetime(pd.Series({code: crawled.get(code) for code in table.index}, dtype=object))
+    table["days_since_crawl"] = (pd.Timestamp(now) - last_crawled).dt.days
+    # 抓過卻仍沒有歷史檔（下市或查無資料）的代號不再每次優先重試
+    table.loc[(table["tier"] == "new") & last_crawled.notna().to_numpy(), "tier"] = "dormant"
+
+    cadence = {"thin": THIN_CADENCE_DAYS, "dormant": DORMANT_CADENCE_DAYS}
+    due = pd.Series(True, index=table.index)
+    if not full:
+        for tier, days in cadence.items():
+            in_tier = table["tier"] == tier
+            recent = table["days_since_crawl"].fillna(days) < days
+            due &= ~(in_tier & recent)
+
+    table["tier_rank"] = table["tier"].map({tier: i for i, tier in enumerate(TIER_ORDER)})
+    # 同一層級內：新股與活躍股成交金額大的先；清淡與冷門股越久沒抓越先
+    staleness = table["days_since_crawl"].fillna(10 ** 6)
+    table["order_key"] = staleness.where(table["tier"].isin(["thin", "dormant"]), table["avg_turnover"])
+    ordered = table.sort_values(
+        ["tier_rank", "order_key", "avg_turnover"], ascending=[True, False, False], kind="stable"
+    )
+    selected = [code for code in ordered.index if due[code]]
+    skipped = [code for code in ordered.index if not due[code]]
+    return CrawlPlan(market, selected, table, skipped)
@@ -0,0 +1,236 @@
+import requests
+import pandas as pd
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.rate_limiter import set_min_interval, throttle
+from 共用工具.changelog import snapshot, emit_file_changes
+
+# 月彙總資料（每檔一年一次請求，一次取回 12 個月）
+SAVE_DIRS = {
+    "listed": os.path.join(PROJECT_ROOT, "data", "list_company_stock_month_data"),
+    "otc": os.path.join(PROJECT_ROOT, "data", "over_the_counter_month_data"),
+}
+
+# 股票代號清單
+CODE_FILES = {
+    "listed": "list_company_number.csv",
+    "otc": "over_the_counter_number.csv",
+    "emerging": "emerging_stock_market.csv",
+}
+
+# === API 網址 ===
+# 證交所「個股月成交資訊」：date 只看年份，一次回傳整年 12 個月
+TWSE_MONTH_URL = "https://www.twse.com.tw/rwd/zh/afterTrading/FMSRFK?date={year}0101&stockNo={code}&response=json"
+# 櫃買中心「個股月成交資訊」
+TPEX_MONTH_URL = "https://www.tpex.org.tw/www/zh-tw/afterTrading/tradingStockMonth"
+
+# === 常見 User-Agent 清單 ===
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
+]
+
+# === 讀取股票代號與上市日 ===
+def read_stock_list(market: str):
+    csv_path = os.path.join(PROJECT_ROOT, "data", CODE_FILES[market])
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"找不到股票代號檔案：{csv_path}")
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str)
+    df = df.dropna(subset=[df.columns[0]])
+
+    stocks = []
+    for _, row in df.iterrows():
+        listing_year = None
+        listing_date = str(row.get("上市日", "") or "")
+        if listing_date[:4].isdigit():
+            listing_year = int(listing_date[:4])
+        stocks.append((row.iloc[0].strip(), listing_year))
+    return stocks
+
+# === 隨機 header ===
+def get_random_headers(referer):
+    return {
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+        "Referer": referer,
+        "User-Agent": random.choice(USER_AGENTS),
+        "X-Requested-With": "XMLHttpRequest",
+    }
+
+# === 請求封裝 ===
+def safe_request(method, url, retries=3, delay=2, **kwargs):
+    for attempt in range(retries):
+        try:
+            throttle(url)
+            res = requests.request(method, url, timeout=10, **kwargs)
+            res.raise_for_status()
+            return res
+        except Exception as e:
+            if attempt < retries - 1:
+                time.sleep(delay * (attempt + 1))
+            else:
+                raise e
+
+# === 抓取單一年度的月彙總 ===
+def fetch_month_summary(market: str, code: str, year: int):
+    if market == "listed":
+        res = safe_request("GET", TWSE_MONTH_URL.format(year=year, code=code))
+        json_data = res.json()
+        return json_data.get("fields", []), json_data.get("data", [])
+
+    payload = {"code": code, "date": f"{year}/01/01", "id": ""}
+    headers = get_random_headers("https://www.tpex.org.tw/zh-tw/mainboard/trading/info/stock-month.html")
+    res = safe_request("POST", TPEX_MONTH_URL, headers=headers, data=payload)
+    table = res.json().get("tables", [{}])[0]
+    return table.get("fields", []), table.get("data", [])
+
+# === 已存在的年度（最新一年可能不完整，其餘已有資料者不再重抓） ===
+def completed_years(existing_df):
+    if existing_df.empty:
+        return set()
+    year_col = existing_df.columns[0]
+    years = pd.to_numeric(existing_df[year_col], errors="coerce").dropna().astype(int)
+    # 證交所回傳民國年，櫃買回傳西元年，一律轉成西元
+    return {y + 1911 if y < 1911 else y for y in years}
+
+# === 抓取單一股票多年月彙總 ===
+def backfill_month_summary(market: str, code: str, start_year: int, end_year: int):
+    save_dir = SAVE_DIRS[market]
+    os.makedirs(save_dir, exist_ok=True)
+    output_path = os.path.join(save_dir, f"{code}.csv")
+    before = snapshot(output_path, key_columns=2)
+    existing_df = pd.read_csv(output_path, encoding="utf-8-sig", dtype=str) if os.path.exists(output_path) else pd.DataFrame()
+
+    done_years = completed_years(existing_df)
+    latest_done = max(done_years) if done_years else None
+    frames = [existing_df] if not existing_df.empty else []
+    fetched = 0
+
+    for year in range(end_year, start_year - 1, -1):
+        if year in done_years and year != latest_done:
+            continue
+        try:
+            fields, data = fetch_month_summary(market, code, year)
+            fetched += 1
+            # 某一年沒有資料（停牌、查詢失敗回空表）不代表更早的年份也沒有，照樣往前抓到上市年
+            if data:
+                frames.append(pd.DataFrame(data, columns=fields))
+        except Exception as e:
+            print(f"⚠️ [{code}] 抓取 {year} 年月彙總失敗: {e}")
+
+    if not frames:
+        print(f"⚠️ [{code}] 無資料")
+        return 0
+
+    df = pd.concat(frames, ignore_index=True).astype(str)
+    year_col, month_col = df.columns[0], df.columns[1]
+    # 同年同月以最新抓到的為準（當月資料會隨時間更新）
+    df = df.drop_duplicates(subset=[year_col, month_col], keep="last")
+    df["_y"] = pd.to_numeric(df[year_col], errors="coerce")
+    df["_m"] = pd.to_numeric(df[month_col], errors="coerce")
+    df = df.sort_values(by=["_y", "_m"], ascending=False).drop(columns=["_y", "_m"])
+    df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    emit_file_changes(output_path, before, "month_summary", key_columns=2)
+    print(f"✅ [{code}] 月彙總已更新，共 {len(df)} 筆（本次請求 {fetched} 次）")
+    return fetched
+
+# === 依使用者指定區間補抓日成交明細 ===
+def month_count(start_ym: str, end_ym: str):
+    sy, sm = map(int, start_ym.split("-"))
+    ey, em = map(int, end_ym.split("-"))
+    return (ey - sy) * 12 + (em - sm) + 1
+
+def backfill_daily(market: str, codes, start_ym: str, end_ym: str, workers: int = 4):
+    # 直接沿用各市場日成交爬蟲，請求頻率由共用限制器控制
+    if market == "listed":
+        from 讀取歷史價格.fetch_list_company_number_day_price_information import fetch_twse_stock as fetch_day
+    elif market == "otc":
+        from 讀取歷史價格.fetch_over_the_encounter_day_price import fetch_tpex_stock as fetch_day
+    else:
+        from 讀取歷史價格.fetch_emerging_stock_market_day_price import fetch_emerging_stock as fetch_day
+
+    months = month_count(start_ym, end_ym)
+    if months <= 0:
+        raise ValueError(f"日期區間錯誤：{start_ym} ~ {end_ym}")
+    end_year, end_month = map(int, end_ym.split("-"))
+    # 證交所爬蟲吃西元年，櫃買與興櫃爬蟲吃民國年
+    start_year_arg = end_year if market == "listed" else end_year - 1911
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_day, code, start_year_arg, end_month, months=months): code for code in codes}
+        with tqdm(total=len(futures), desc=f"日明細 {start_ym}~{end_ym}") as pbar:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ [{futures[future]}] 執行失敗：{e}")
+                pbar.update(1)
+
+# === 多年月彙總回補（平行處理，頻率受共用限制器控制） ===
+def backfill(market: str, start_year: int, end_year: int = None, codes=None, workers: int = 4):
+    if market not in SAVE_DIRS:
+        print(f"⚠️ {market} 沒有月彙總端點，請改用 --daily 指定區間補抓日明細")
+        return
+
+    end_year = end_year or datetime.now().year
+    stocks = read_stock_list(market)
+    if codes:
+        wanted = set(codes)
+        stocks = [s for s in stocks if s[0] in wanted]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for code, listing_year in stocks:
+            first_year = max(start_year, listing_year or start_year)
+            futures[executor.submit(backfill_month_summary, market, code, first_year, end_year)] = code
+        with tqdm(total=len(futures), desc="月彙總進度") as pbar:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ [{futures[future]}] 執行失敗：{e}")
+                pbar.update(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="以月彙總端點回補多年歷史，並可指定區間補抓日明細")
+    parser.add_argument("--market", choices=["listed", "otc", "emerging"], default="listed")
+    parser.add_argument("--start-year", type=int, default=datetime.now().year - 10)
+    parser.add_argument("--end-year", type=int, default=None)
+    parser.add_argument("--codes", nargs="*", help="只處理指定股票代號")
+    parser.add_argument("--daily", nargs=2, metavar=("START_YM", "END_YM"),
+                        help="補抓日成交明細的區間，例如 2024-01 2024-06")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--min-interval", type=float,
+                        help="同一主機兩次請求的最短間隔秒數，預設沿用共用限制器（證交所 3 秒、櫃買約 0.8 秒）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.min_interval is not None:
+        # 執行緒數只影響平行度，總請求頻率由這個間隔決定
+        set_min_interval(TWSE_MONTH_URL if args.market == "listed" else TPEX_MONTH_URL, args.min_interval, jitter=0.0)
+    if args.daily:
+        codes = args.codes or [code for code, _ in read_stock_list(args.market)]
+        backfill_daily(args.market, codes, args.daily[0], args.daily[1], workers=args.workers)
+    else:
+        backfill(args.market, args.start_year, args.end_year, codes=args.codes, workers=args.workers)
+
+
+# === 主程式 ===
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import requests
+import pandas as pd
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.rate_limiter import set_min_interval, throttle
+from 共用工具.changelog import snapshot, emit_file_changes
+
+# 年彙總資料（每檔一次請求即取回上市以來所有年度）
+SAVE_DIRS = {
+    "listed": os.path.join(PROJECT_ROOT, "data", "list_company_stock_year_data"),
+    "otc": os.path.join(PROJECT_ROOT, "data", "over_the_counter_year_data"),
+}
+
+CODE_FILES = {
+    "listed": "list_company_number.csv",
+    "otc": "over_the_counter_number.csv",
+}
+
+# === API 網址 ===
+# 證交所「個股年成交資訊」
+TWSE_YEAR_URL = "https://www.twse.com.tw/rwd/zh/afterTrading/FMNPTK?stockNo={code}&response=json"
+# 櫃買中心「個股年成交資訊」
+TPEX_YEAR_URL = "https://www.tpex.org.tw/www/zh-tw/afterTrading/tradingStockYear"
+
+# === 常見 User-Agent 清單 ===
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0",
+]
+
+# === 讀取股票代號 ===
+def read_stock_codes(market: str):
+    csv_path = os.path.join(PROJECT_ROOT, "data", CODE_FILES[market])
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"找不到股票代號檔案：{csv_path}")
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str)
+    return df.iloc[:, 0].dropna().str.strip().tolist()
+
+# === 隨機 header ===
+def get_random_headers():
+    return {
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+        "Referer": "https://www.tpex.org.tw/zh-tw/mainboard/trading/info/stock-year.html",
+        "User-Agent": random.choice(USER_AGENTS),
+        "X-Requested-With": "XMLHttpRequest",
+    }
+
+# === 請求封裝 ===
+def safe_request(method, url, retries=3, delay=2, **kwargs):
+    for attempt in range(retries):
+        try:
+            throttle(url)
+            res = requests.request(method, url, timeout=10, **kwargs)
+            res.raise_for_status()
+            return res
+        except Exception as e:
+            if attempt < retries - 1:
+                time.sleep(delay * (attempt + 1))
+            else:
+                raise e
+
+# === 欄位名稱去重 ===
+# FMNPTK 的最高價、最低價後面各跟一個「日期」欄位，直接轉 DataFrame 會撞名
+def dedupe_fields(fields):
+    result = []
+    for i, name in enumerate(fields):
+        if fields.count(name) > 1 and i > 0:
+            name = f"{fields[i - 1]}{name}"
+        result.append(name)
+    return result
+
+# === 抓取單一股票年彙總 ===
+def fetch_year_summary(market: str, code: str):
+    if market == "listed":
+        res = safe_request("GET", TWSE_YEAR_URL.format(code=code))
+        json_data = res.json()
+        fields, data = json_data.get("fields", []), json_data.get("data", [])
+    else:
+        payload = {"code": code, "id": ""}
+        res = safe_request("POST", TPEX_YEAR_URL, headers=get_random_headers(), data=payload)
+        table = res.json().get("tables", [{}])[0]
+        fields, data = table.get("fields", []), table.get("data", [])
+
+    save_dir = SAVE_DIRS[market]
+    os.makedirs(save_dir, exist_ok=True)
+    output_path = os.path.join(save_dir, f"{code}.csv")
+
+    if not data:
+        print(f"⚠️ [{code}] 無資料")
+        return
+
+    before = snapshot(output_path)
+    df = pd.DataFrame(data, columns=dedupe_fields(fields)).astype(str)
+    if os.path.exists(output_path):
+        existing_df = pd.read_csv(output_path, encoding="utf-8-sig", dtype=str)
+        df = pd.concat([existing_df, df], ignore_index=True)
+
+    year_col = df.columns[0]
+    # 同一年度以最新抓到的為準（當年度資料會隨時間更新）
+    df = df.drop_duplicates(subset=[year_col], keep="last")
+    df["_y"] = pd.to_numeric(df[year_col], errors="coerce")
+    df = df.sort_values(by="_y", ascending=False).drop(columns=["_y"])
+    df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    emit_file_changes(output_path, before, "year_summary")
+    print(f"✅ [{code}] 年彙總已更新，共 {len(df)} 年")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="以年彙總端點取得個股上市以來逐年成交資訊")
+    parser.add_argument("--market", choices=["listed", "otc"], default="listed")
+    parser.add_argument("--codes", nargs="*", help="只處理指定股票代號")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--min-interval", type=float,
+                        help="同一主機兩次請求的最短間隔秒數，預設沿用共用限制器（證交所 3 秒、櫃買約 0.8 秒）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.min_interval is not None:
+        # 執行緒數只影響平行度，總請求頻率由這個間隔決定
+        set_min_interval(TWSE_YEAR_URL if args.market == "listed" else TPEX_YEAR_URL, args.min_interval, jitter=0.0)
+    codes = args.codes or read_stock_codes(args.market)
+
+    # 平行送出，實際請求頻率由共用限制器控制
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(fetch_year_summary, args.market, code): code for code in codes}
+        with tqdm(total=len(futures), desc="年彙總進度") as pbar:
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ [{futures[future]}] 執行失敗：{e}")
+                pbar.update(1)
+
+
+# === 主程式 ===
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import requests
 import pandas as pd
 import os
+import sys
 import time
 import random
 from datetime import datetime
@@ -11,7 +12,12 @@ from tqdm import tqdm
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
 SAVE_DIR = os.path.join(PROJECT_ROOT, "data", "emerging_stock_data")
-os.makedirs(SAVE_DIR, exist_ok=True)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.rate_limiter import throttle
+from 共用工具.changelog import snapshot, emit_file_changes
+from 讀取歷史價格.crawl_scheduler import plan_crawl
 
 # === 常見 User-Agent 清單 ===
 USER_AGENTS = [
@@ -25,8 +31,8 @@ def read_stock_codes():
     csv_path = os.path.join(PROJECT_ROOT, "data", "emerging_stock_market.csv")
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"找不到股票代號檔案：{csv_path}")
-    df = pd.read_csv(csv_path, encoding="utf-8-sig")
-    return df.iloc[:, 0].dropna().astype(str).tolist()
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str)  # 以字串讀取，保留 006201 這類代號的前導 0
+    return df.iloc[:, 0].dropna().str.strip().tolist()
 
 # === 隨機 header ===
 def get_random_headers():
@@ -41,6 +47,7 @@ def get_random_headers():
 def safe_post(url, headers, data, retries=3, delay=2):
     for attempt in range(retries):
         try:
+            throttle(url)  # 與其他爬蟲共用同一主機的頻率限制
             res = requests.post(url, headers=headers, data=data, timeout=10)
             res.raise_for_status()
             return res
@@ -51,21 +58,23 @@ def safe_post(url, headers, data, retries=3, delay=2):
                 raise e
 
 # === 抓取單一興櫃股票資料 ===
+# 回傳成功的月份數；全部失敗時為 0
 def fetch_emerging_stock(code: str, start_roc_year: int, start_month: int, months: int = 12):
     time.sleep(random.uniform(1.0, 2.0))  # 降低被鎖機率
 
+    os.makedirs(SAVE_DIR, exist_ok=True)
     output_path = os.path.join(SAVE_DIR, f"{code}.csv")
+    before = snapshot(output_path)  # 寫檔後比對，產生異動紀錄
     existing_df = pd.read_csv(output_path, encoding="utf-8-sig") if os.path.exists(output_path) else pd.DataFrame()
 
     url = "https://www.tpex.org.tw/www/zh-tw/emerging/historical"
     columns_needed = ["日期", "成交股數", "成交金額", "成交最高", "成交最低", "成交均價", "成交筆數"]
 
+    succeeded = 0
     for i in range(months):
-        month_offset = start_month - i
-        year_offset = start_roc_year
-        if month_offset <= 0:
-            month_offset += 12
-            year_offset -= 1
+        # 往前第 i 個月；區間超過一年時也能正確跨越多個年度
+        year_offset, month_offset = divmod(start_roc_year * 12 + start_month - 1 - i, 12)
+        month_offset += 1
 
         y = year_offset + 1911
         date_str = f"{y}/{month_offset:02d}/01"
@@ -92,6 +101,7 @@ def fetch_emerging_stock(code: str, start_roc_year: int, start_month: int, month
 
                 if not month_df.empty:
                     existing_df = pd.concat([existing_df, month_df], ignore_index=True)
+            succeeded += 1
 
         except Exception as e:
             print(f"⚠️ [{code}] 抓取 {year_offset}年{month_offset:02d} 月失敗: {e}")
@@ -121,9 +131,11 @@ def fetch_emerging_stock(code: str, start_roc_year: int, start_month: int, month
             print(f"⚠️ 排序失敗：{e}")
 
         existing_df.to_csv(output_path, index=False, encoding="utf-8-sig")
+        emit_file_changes(output_path, before, "emerging_history")
         print(f"✅ [{code}] 資料已更新，共 {len(existing_df)} 筆")
     else:
         print(f"⚠️ [{code}] 無資料")
+    return succeeded
 
 
 # === 包裝函式 ===
@@ -131,23 +143,37 @@ def fetch_task(code):
     now = datetime.now()
     current_roc_year = now.year - 1911
     current_month = now.month
-    fetch_emerging_stock(code, current_roc_year, current_month, months=12)
+    return fetch_emerging_stock(code, current_roc_year, current_month, months=12)
 
 # === 主程式 ===
-if __name__ == "__main__":
+def main(full=False):
     try:
         stock_codes = read_stock_codes()
     except Exception as e:
         print(f"讀取股票代號失敗：{e}")
-        exit(1)
+        sys.exit(1)
+
+    # 依近期成交金額與上次抓取時間排序：活躍股先抓，清淡 / 冷門股拉長重抓週期
+    plan = plan_crawl("emerging", stock_codes, full=full)
+    print(plan.summary())
 
     MAX_WORKERS = 2
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(fetch_task, code): code for code in stock_codes}
-        with tqdm(total=len(stock_codes), desc="興櫃股票進度") as pbar:
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"❌ [{futures[future]}] 執行失敗：{e}")
-                pbar.update(1)
+    try:
+        # 依排程順序送出，執行緒池會照送出順序取用
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {executor.submit(fetch_task, code): code for code in plan.codes}
+            with tqdm(total=len(plan.codes), desc="興櫃股票進度") as pbar:
+                for future in as_completed(futures):
+                    try:
+                        # 所有月份都失敗時不記錄抓取時間，下次照常排入
+                        if future.result():
+                            plan.mark_done(futures[future])
+                    except Exception as e:
+                        print(f"❌ [{futures[future]}] 執行失敗：{e}")
+                    pbar.update(1)
+    finally:
+        plan.save()
+
+
+if __name__ == "__main__":
+    main()
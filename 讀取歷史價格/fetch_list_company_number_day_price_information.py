@@ -1,6 +1,7 @@
 import requests
 import pandas as pd
 import os
+import sys
 import time
 import random
 from datetime import datetime
@@ -10,7 +11,12 @@ from tqdm import tqdm
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
 SAVE_DIR = os.path.join(PROJECT_ROOT, "data", "list_company_stock_data")
-os.makedirs(SAVE_DIR, exist_ok=True)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.rate_limiter import throttle
+from 共用工具.changelog import snapshot, emit_file_changes
+from 讀取歷史價格.crawl_scheduler import plan_crawl
 
 # === 常見 User-Agent 清單 ===
 USER_AGENTS = [
@@ -24,8 +30,8 @@ def read_stock_codes():
     csv_path = os.path.join(PROJECT_ROOT, "data", "list_company_number.csv")
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"找不到股票代號檔案：{csv_path}")
-    df = pd.read_csv(csv_path, encoding="utf-8-sig")
-    return df.iloc[:, 0].dropna().astype(str).tolist()
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str)  # 以字串讀取，保留 006201 這類代號的前導 0
+    return df.iloc[:, 0].dropna().str.strip().tolist()
 
 # === 隨機 header ===
 def get_random_headers():
@@ -40,6 +46,7 @@ def get_random_headers():
 def safe_get(url, retries=3, delay=2):
     for attempt in range(retries):
         try:
+            throttle(url)  # 與其他爬蟲共用同一主機的頻率限制
             res = requests.get(url, timeout=10)
             res.raise_for_status()
             return res
@@ -50,8 +57,11 @@ def safe_get(url, retries=3, delay=2):
                 raise e
 
 # === 抓取單一股票資料（半年內） ===
+# 回傳成功的月份數（檔案裡已有而不需重抓的月份也算）；全部失敗時為 0
 def fetch_twse_stock(code: str, start_year: int, start_month: int, months: int = 12):
+    os.makedirs(SAVE_DIR, exist_ok=True)
     output_path = os.path.join(SAVE_DIR, f"{code}.csv")
+    before = snapshot(output_path)  # 寫檔後比對，產生異動紀錄
     existing_df = pd.read_csv(output_path, encoding="utf-8-sig") if os.path.exists(output_path) else pd.DataFrame()
 
     url_template = "https://www.twse.com.tw/rwd/zh/afterTrading/STOCK_DAY?date={date_str}&stockNo={code}&response=json"
@@ -71,18 +81,18 @@ def fetch_twse_stock(code: str, start_year: int, start_month: int, months: int =
         except Exception as e:
             print(f"⚠️ [{code}] 日期格式轉換失敗: {e}")
 
+    succeeded = 0
     for i in range(months):
-        month_offset = start_month - i
-        year_offset = start_year
-        if month_offset <= 0:
-            month_offset += 12
-            year_offset -= 1
+        # 往前第 i 個月；區間超過一年時也能正確跨越多個年度
+        year_offset, month_offset = divmod(start_year * 12 + start_month - 1 - i, 12)
+        month_offset += 1
 
         y = year_offset
         ym_str = f"{y}-{month_offset:02d}"
         date_str = f"{y}{month_offset:02d}01"
 
         if ym_str in existing_months:
+            succeeded += 1
             continue
 
         url = url_template.format(date_str=date_str, code=code)
@@ -110,6 +120,7 @@ def fetch_twse_stock(code: str, start_year: int, start_month: int, months: int =
                     existing_df.drop_duplicates(inplace=True)
 
                     existing_months = set(existing_df["日期_西元"].dropna().dt.strftime("%Y-%m"))
+            succeeded += 1
         except Exception as e:
             print(f"⚠️ [{code}] 抓取 {ym_str} 失敗: {e}")
 
@@ -131,29 +142,44 @@ def fetch_twse_stock(code: str, start_year: int, start_month: int, months: int =
             print(f"⚠️ 排序或轉換民國日期失敗: {e}")
 
         existing_df.to_csv(output_path, index=False, encoding="utf-8-sig")
+        emit_file_changes(output_path, before, "listed_history")
         print(f"✅ [{code}] 資料已更新")
     else:
         print(f"⚠️ [{code}] 無資料")
 
     time.sleep(3)
+    return succeeded
 
 
 # === 主程式（單執行緒 + 進度條）===
-if __name__ == "__main__":
+def main(full=False):
     try:
         stock_codes = read_stock_codes()
     except Exception as e:
         print(f"讀取股票代號失敗：{e}")
-        exit(1)
+        sys.exit(1)
+
+    # 依近期成交金額與上次抓取時間排序：活躍股先抓，清淡 / 冷門股拉長重抓週期
+    plan = plan_crawl("listed", stock_codes, full=full)
+    print(plan.summary())
 
     now = datetime.now()
     current_year = now.year
     current_month = now.month
 
-    with tqdm(total=len(stock_codes), desc="股票進度") as pbar:
-        for code in stock_codes:
-            try:
-                fetch_twse_stock(code, current_year, current_month, months=6)
-            except Exception as e:
-                print(f"❌ [{code}] 執行失敗：{e}")
-            pbar.update(1)
+    try:
+        with tqdm(total=len(plan.codes), desc="股票進度") as pbar:
+            for code in plan.codes:
+                try:
+                    # 所有月份都失敗時不記錄抓取時間，下次照常排入
+                    if fetch_twse_stock(code, current_year, current_month, months=6):
+                        plan.mark_done(code)
+                except Exception as e:
+                    print(f"❌ [{code}] 執行失敗：{e}")
+                pbar.update(1)
+    finally:
+        plan.save()
+
+
+if __name__ == "__main__":
+    main()
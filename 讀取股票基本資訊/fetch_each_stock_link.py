@@ -1,5 +1,15 @@
 import csv
 import os
+import sys
+
+# 資料夾路徑（以專案根目錄為準，不受執行時所在目錄影響）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.changelog import snapshot, emit_file_changes
 
 def fetch_cnyes_stock_link(input_file):
     output_rows = []
@@ -28,22 +38,29 @@ def fetch_cnyes_stock_link(input_file):
             output_rows.append(row)
 
     # 寫回原 CSV 檔案（覆寫）
+    before = snapshot(input_file)
     with open(input_file, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
         writer.writerows(output_rows)
+    emit_file_changes(input_file, before, "links")
 
     print(f"✅ 已成功更新鉅亨網網址至 {input_file}")
 
 # ✅ 一次處理多個檔案
-file_list = [
+FILE_LIST = [
     "list_company_number.csv",
     "emerging_stock_market.csv",
     "over_the_counter_number.csv"
 ]
 
-# 根據 output_folder 建立完整路徑並處理每個檔案
-for file in file_list:
-    output_folder = os.path.join("data")
-    full_path = os.path.join(output_folder, file)
-    fetch_cnyes_stock_link(full_path)
+
+def main(file_list=None):
+    # 根據 DATA_FOLDER 建立完整路徑並處理每個檔案
+    for file in file_list or FILE_LIST:
+        full_path = os.path.join(DATA_FOLDER, file)
+        fetch_cnyes_stock_link(full_path)
+
+
+if __name__ == "__main__":
+    main()
 
@@ -2,16 +2,24 @@ import requests
 from bs4 import BeautifulSoup
 import csv
 import os
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from tqdm import tqdm  # ✅ 新增進度條模組
 
-# 資料夾路徑
-DATA_FOLDER = os.path.join("data")
+# 資料夾路徑（以專案根目錄為準，不受執行時所在目錄影響）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.changelog import snapshot, emit_file_changes
+
+FILE_LIST = [
+    "list_company_number.csv",
+    "over_the_counter_number.csv",
+    "emerging_stock_market.csv",
+]
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0",
@@ -62,6 +70,13 @@ def fetch_price_cmoney(stock_id, row, price_index, change_index, percent_index,
         return False
 
 def fetch_price_pchome(stock_id, row, price_index, change_index, percent_index, source_index):
+    # selenium 載入很慢，只有前兩個來源都失敗時才需要
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     options = Options()
     options.add_argument("--headless")
     options.add_argument("--disable-gpu")
@@ -140,14 +155,19 @@ def run(filename):
         for future in tqdm(as_completed(futures), total=len(futures), desc="📈 更新中"):
             future.result()
 
+    before = snapshot(filepath)
     with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
         writer.writerow(header)
         writer.writerows(rows)
+    emit_file_changes(filepath, before, "quotes")
 
     print(f"\n✅ 更新完成：{filename}")
 
-# ✅ 呼叫（範例）
-run("list_company_number.csv")
-run("over_the_counter_number.csv")
-run("emerging_stock_market.csv")
+def main(file_list=None):
+    for filename in file_list or FILE_LIST:
+        run(filename)
+
+
+if __name__ == "__main__":
+    main()
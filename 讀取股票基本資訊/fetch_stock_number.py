@@ -1,9 +1,19 @@
 import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 import csv
 from concurrent.futures import ThreadPoolExecutor
 
+# 資料夾路徑（以專案根目錄為準，不受執行時所在目錄影響）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+DATA_FOLDER = os.path.join(PROJECT_ROOT, "data")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.changelog import snapshot, emit_file_changes
+
 def fetch_stock_data(mode, output_filename, valid_cfi_prefixes, output_dir="output"):
     # 確保資料夾存在
     os.makedirs(output_dir, exist_ok=True)
@@ -47,10 +57,12 @@ def fetch_stock_data(mode, output_filename, valid_cfi_prefixes, output_dir="outp
                         ])
                         stock_id_list.append(stock_id)
 
+        before = snapshot(filepath)
         with open(filepath, "w", newline="", encoding="utf-8-sig") as f:
             writer = csv.writer(f)
             writer.writerow(["股票代號", "股票名稱", "上市日", "市場別", "產業別"])
             writer.writerows(stocks)
+        emit_file_changes(filepath, before, "universe")
 
         print(f"✅ 已成功儲存 {len(stocks)} 筆資料至 {filepath}")
     else:
@@ -62,22 +74,31 @@ def fetch_stock_data(mode, output_filename, valid_cfi_prefixes, output_dir="outp
 def fetch_stock_data_thread(args):
     return fetch_stock_data(*args)
 
-output_folder = os.path.join("data")
-
 # 任務清單：加入 output_dir 作為第 4 個參數
-tasks = [
-    (2, "list_company_number.csv", ('ESV', 'CEO', 'CMX', 'EDS', 'CBC', 'EF', 'EP'), output_folder),
-    (4, "over_the_counter_number.csv", ('ESV', 'CEO', 'CMX', 'EPN'), output_folder),
-    (5, "emerging_stock_market.csv", ('ESV',), output_folder),
+TASKS = [
+    (2, "list_company_number.csv", ('ESV', 'CEO', 'CMX', 'EDS', 'CBC', 'EF', 'EP'), DATA_FOLDER),
+    (4, "over_the_counter_number.csv", ('ESV', 'CEO', 'CMX', 'EPN'), DATA_FOLDER),
+    (5, "emerging_stock_market.csv", ('ESV',), DATA_FOLDER),
 ]
 
-# 執行任務
-all_stock_ids = []
-with ThreadPoolExecutor(max_workers=10) as executor:
-    results = executor.map(fetch_stock_data_thread, tasks)
-    for stock_ids in results:
-        all_stock_ids.extend(stock_ids)
 
-# 去除重複並示範前10筆
-all_stock_ids = list(set(all_stock_ids))
-print("📌 前10個股票代號：", all_stock_ids[:10])
+def main():
+    # 執行任務
+    all_stock_ids = []
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = executor.map(fetch_stock_data_thread, TASKS)
+        for stock_ids in results:
+            all_stock_ids.extend(stock_ids)
+
+    # 清單有變動時增量更新股票搜尋索引
+    from 資料分析.symbol_index import update as update_symbol_index
+    update_symbol_index()
+
+    # 去除重複並示範前10筆
+    all_stock_ids = list(set(all_stock_ids))
+    print("📌 前10個股票代號：", all_stock_ids[:10])
+    return all_stock_ids
+
+
+if __name__ == "__main__":
+    main()
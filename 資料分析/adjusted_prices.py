@@ -0,0 +1,307 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+ACTIONS_DIR = os.path.join(PROJECT_ROOT, "data", "corporate_actions")
+ACTIONS_PATH = os.path.join(ACTIONS_DIR, "actions.csv")
+FACTOR_DIR = os.path.join(PROJECT_ROOT, "data", "adjust_factors")
+FACTOR_INDEX_PATH = os.path.join(FACTOR_DIR, "index.json")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.rate_limiter import throttle
+from 資料分析.history_store import load_history
+
+# === 除權除息計算結果表 ===
+TWSE_ACTIONS_URL = "https://www.twse.com.tw/rwd/zh/exRight/TWT49U?startDate={start}&endDate={end}&response=json"
+TPEX_ACTIONS_URL = "https://www.tpex.org.tw/www/zh-tw/bulletin/exDailyQ"
+
+ACTION_COLUMNS = ["code", "ex_date", "prev_close", "ref_price", "kind", "source"]
+
+# 兩個交易所欄位名稱略有不同，依名稱找欄位
+FIELD_CANDIDATES = {
+    "ex_date": ["資料日期", "除權息日期"],
+    "code": ["股票代號", "代號"],
+    "prev_close": ["除權息前收盤價", "前收盤價"],
+    "ref_price": ["除權息參考價", "參考價"],
+    "kind": ["權/息", "除權息"],
+}
+
+
+# === 日期轉換（113年01月02日、113/01/02、2024-01-02 都接受） ===
+def parse_action_date(text):
+    text = str(text).strip()
+    match = re.match(r"^(\d{2,4})\D(\d{1,2})\D(\d{1,2})", text)
+    if not match:
+        return None
+    year, month, day = (int(part) for part in match.groups())
+    if year < 1911:
+        year += 1911
+    return datetime(year, month, day).strftime("%Y-%m-%d")
+
+
+def _to_float(text):
+    try:
+        return float(str(text).replace(",", "").strip())
+    except ValueError:
+        return float("nan")
+
+
+def normalize_actions(fields, rows, source) -> pd.DataFrame:
+    index = {}
+    for key, names in FIELD_CANDIDATES.items():
+        index[key] = next((fields.index(name) for name in names if name in fields), None)
+    if index["code"] is None or index["ex_date"] is None or index["ref_price"] is None or index["prev_close"] is None:
+        raise ValueError(f"無法辨識除權息表欄位：{fields}")
+
+    records = []
+    for row in rows:
+        records.append({
+            "code": str(row[index["code"]]).strip(),
+            "ex_date": parse_action_date(row[index["ex_date"]]),
+            "prev_close": _to_float(row[index["prev_close"]]),
+            "ref_price": _to_float(row[index["ref_price"]]),
+            "kind": str(row[index["kind"]]).strip() if index["kind"] is not None else "",
+            "source": source,
+        })
+    df = pd.DataFrame(records, columns=ACTION_COLUMNS)
+    return df.dropna(subset=["ex_date"])
+
+
+# === 從交易所抓取（可用 fetcher 參數替換成離線資料） ===
+def fetch_exchange_actions(start: str, end: str):
+    import requests
+
+    frames = []
+    url = TWSE_ACTIONS_URL.format(start=start.replace("-", ""), end=end.replace("-", ""))
+    throttle(url)
+    res = requests.get(url, timeout=10)
+    res.raise_for_status()
+    data = res.json()
+    frames.append(normalize_actions(data.get("fields", []), data.get("data", []), "twse"))
+
+    payload = {"startDate": start.replace("-", "/"), "endDate": end.replace("-", "/"), "response": "json"}
+    throttle(TPEX_ACTIONS_URL)
+    res = requests.post(TPEX_ACTIONS_URL, data=payload, timeout=10)
+    res.raise_for_status()
+    table = res.json().get("tables", [{}])[0]
+    frames.append(normalize_actions(table.get("fields", []), table.get("data", []), "tpex"))
+    return pd.concat(frames, ignore_index=True)
+
+
+# === 除權息事件儲存 ===
+def load_actions() -> pd.DataFrame:
+    if not os.path.exists(ACTIONS_PATH):
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+    return pd.read_csv(ACTIONS_PATH, encoding="utf-8-sig", dtype={"code": str, "kind": str, "source": str})
+
+
+def ingest(actions: pd.DataFrame):
+    # 合併新事件，回傳事件有變動的股票代號；只有這些代號的因子快取會失效
+    existing = load_actions()
+    merged = pd.concat([existing, actions[ACTION_COLUMNS]], ignore_index=True)
+    merged = merged.drop_duplicates(subset=["code", "ex_date"], keep="last")
+    merged = merged.sort_values(["code", "ex_date"], ignore_index=True)
+
+    os.makedirs(ACTIONS_DIR, exist_ok=True)
+    tmp = ACTIONS_PATH + ".tmp"
+    merged.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, ACTIONS_PATH)
+
+    # 只有已經算過因子、且事件內容與當時不同的代號需要失效；沒有快取的代號下次查詢時才計算
+    index = _load_factor_index()
+    changed = [
+        code for code, rows in merged.groupby("code")
+        if code in index and index[code] != _actions_digest(rows)
+    ]
+    _invalidate(changed)
+    return changed
+
+
+def update_actions(start: str, end: str, fetcher=None):
+    actions = (fetcher or fetch_exchange_actions)(start, end)
+    changed = ingest(actions)
+    print(f"✅ 除權息資料已更新：{len(actions)} 筆事件，{len(changed)} 檔需要重算因子")
+    return changed
+
+
+# === 調整因子快取 ===
+def _actions_digest(rows: pd.DataFrame) -> str:
+    key = rows[["ex_date", "prev_close", "ref_price", "kind"]].astype(str).to_csv(index=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _load_factor_index() -> dict:
+    if not os.path.exists(FACTOR_INDEX_PATH):
+        return {}
+    with open(FACTOR_INDEX_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_factor_index(index: dict):
+    os.makedirs(FACTOR_DIR, exist_ok=True)
+    tmp = FACTOR_INDEX_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, FACTOR_INDEX_PATH)
+
+
+def _factor_path(code: str) -> str:
+    return os.path.join(FACTOR_DIR, f"{code}.csv")
+
+
+def _invalidate(codes):
+    index = _load_factor_index()
+    for code in codes:
+        path = _factor_path(code)
+        if os.path.exists(path):
+            os.remove(path)
+        index.pop(code, None)
+    _save_factor_index(index)
+    _cached_factors.cache_clear()
+
+
+def compute_factors(rows: pd.DataFrame) -> pd.DataFrame:
+    # 單一事件因子 = 除權息參考價 / 除權息前收盤價；
+    # 除權息日之前的價格乘上「之後所有事件因子的連乘積」即為還原價。
+    # 成交量只隨股數改變：除息（現金股利）不調整，除權（配股、現增）才以同一因子反向調整。
+    # 交易所表格沒有把「權息」拆成配股與現金兩部分，這類事件的成交量因子含現金部分，為近似值。
+    rows = rows.dropna(subset=["prev_close", "ref_price"])
+    rows = rows[(rows["prev_close"] > 0) & (rows["ref_price"] > 0)].sort_values("ex_date")
+    factors = (rows["ref_price"] / rows["prev_close"]).to_numpy()
+    shares_changed = rows["kind"].fillna("").astype(str).str.contains("權").to_numpy()
+    volume_factors = np.where(shares_changed, factors, 1.0)
+    return pd.DataFrame({
+        "ex_date": rows["ex_date"].to_numpy(),
+        "factor": factors,
+        "cum_factor": np.cumprod(factors[::-1])[::-1],
+        "volume_factor": volume_factors,
+        "cum_volume_factor": np.cumprod(volume_factors[::-1])[::-1],
+    })
+
+
+FACTOR_COLUMNS = ["ex_date", "factor", "cum_factor", "volume_factor", "cum_volume_factor"]
+
+
+def factors_for(code: str) -> pd.DataFrame:
+    # 有快取直接讀；沒有（或是沒有成交量因子的舊格式）就由事件表計算一次並寫入快取
+    path = _factor_path(code)
+    if os.path.exists(path):
+        cached = pd.read_csv(path, encoding="utf-8-sig", dtype={"ex_date": str})
+        if list(cached.columns) == FACTOR_COLUMNS:
+            return cached
+
+    actions = load_actions()
+    rows = actions[actions["code"] == code]
+    factors = compute_factors(rows)
+    os.makedirs(FACTOR_DIR, exist_ok=True)
+    factors.to_csv(path, index=False, encoding="utf-8-sig")
+    index = _load_factor_index()
+    index[code] = _actions_digest(rows)
+    _save_factor_index(index)
+    return factors
+
+
+@lru_cache(maxsize=4096)
+def _cached_factors(code: str, mtime_ns: int):
+    factors = factors_for(code)
+    ex_dates = pd.to_datetime(factors["ex_date"]).to_numpy(dtype="datetime64[ns]")
+    return (
+        ex_dates,
+        factors["cum_factor"].to_numpy(dtype="float64"),
+        factors["cum_volume_factor"].to_numpy(dtype="float64"),
+    )
+
+
+def _factor_arrays(code: str):
+    path = _factor_path(code)
+    if not os.path.exists(path):
+        factors_for(code)
+    return _cached_factors(code, os.stat(path).st_mtime_ns)
+
+
+# === 還原價格檢視 ===
+def _lookup(ex_dates, cumulative, dates):
+    # 每個日期對應的累積因子：日期 < 除權息日 的事件都要乘上
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    if len(ex_dates) == 0:
+        return np.ones(len(dates))
+    # side="right"：除權息日當天已是除權後價格，不需調整
+    position = np.searchsorted(ex_dates, dates, side="right")
+    padded = np.append(cumulative, 1.0)
+    return padded[position]
+
+
+def adjustment_series(code: str, dates) -> np.ndarray:
+    ex_dates, cumulative, _ = _factor_arrays(code)
+    return _lookup(ex_dates, cumulative, dates)
+
+
+def volume_adjustment_series(code: str, dates) -> np.ndarray:
+    # 只含除權（股數改變）事件的累積因子
+    ex_dates, _, cumulative = _factor_arrays(code)
+    return _lookup(ex_dates, cumulative, dates)
+
+
+def adjusted_history(code: str, market: str = None, history: pd.DataFrame = None) -> pd.DataFrame:
+    # 原始資料不複製到另一份儲存；每次讀原始歷史後乘上快取的因子
+    history = load_history(code, market) if history is None else history
+    dates = history["date"].to_numpy()
+    factor = adjustment_series(code, dates)
+    adjusted = history.copy()
+    for column in ["open", "high", "low", "close"]:
+        adjusted[column] = history[column] * factor
+    adjusted["volume"] = history["volume"] / volume_adjustment_series(code, dates)
+    adjusted["adj_factor"] = factor
+    return adjusted
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="除權息還原因子：更新事件表、查看還原價")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    p = sub.add_parser("update", help="抓取除權除息計算結果表並更新因子快取")
+    p.add_argument("--start", default=f"{datetime.now().year}-01-01")
+    p.add_argument("--end", default=datetime.now().strftime("%Y-%m-%d"))
+
+    p = sub.add_parser("import", help="匯入離線的除權息事件 CSV（欄位：code, ex_date, prev_close, ref_price）")
+    p.add_argument("path")
+
+    p = sub.add_parser("show", help="顯示單一股票的還原價")
+    p.add_argument("code")
+    p.add_argument("--tail", type=int, default=10)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "update":
+        update_actions(args.start, args.end)
+    elif args.action == "import":
+        actions = pd.read_csv(args.path, encoding="utf-8-sig", dtype={"code": str})
+        actions["ex_date"] = actions["ex_date"].map(parse_action_date)
+        for column in ["kind", "source"]:
+            if column not in actions.columns:
+                actions[column] = "manual" if column == "source" else ""
+        changed = ingest(actions)
+        print(f"✅ 已匯入 {len(actions)} 筆事件，{len(changed)} 檔需要重算因子")
+    else:
+        start = time.perf_counter()
+        adjusted = adjusted_history(args.code)
+        print(adjusted.tail(args.tail).to_string(index=False))
+        print(f"（{(time.perf_counter() - start) * 1000:.1f} ms）")
+
+
+if __name__ == "__main__":
+    main()
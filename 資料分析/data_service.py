@@ -0,0 +1,380 @@
+import os
+import sys
+import gzip
+import time
+import json
+import hashlib
+import argparse
+import threading
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.changelog import ChangeFeed
+from 資料分析.history_store import (
+    DATA_DIR, MARKETS, NORMALIZED_COLUMNS, find_market, history_path, load_histories, load_history,
+    load_universe,
+)
+
+# === 服務參數 ===
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+CACHE_ENTRIES = 4096            # 回應快取最多保留幾筆（LRU）
+POLL_SECONDS = 1.0              # 多久檢查一次爬蟲的異動紀錄
+GZIP_MIN_BYTES = 1024
+QUOTE_COLUMNS = ["股票代號", "股票名稱", "市場別", "產業別", "價格", "漲跌", "漲跌幅度(%)", "market"]
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class NotFound(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+# === 全市場截面（以日期排序的長表格，只重新載入有異動的股票） ===
+class CrossSectionStore:
+    def __init__(self):
+        self._frame = None
+        self._dates = None
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def invalidate(self, market, codes):
+        with self._lock:
+            self._dirty.setdefault(market, set()).update(codes)
+            self.generation += 1
+
+    def _load(self, market, codes=None):
+        frame = load_histories(market, codes)
+        frame.insert(1, "market", market)
+        return frame
+
+    def frame(self):
+        # 回傳 (frame, dates)：兩者在鎖內一起取得，呼叫端切片時不會混用新舊版本
+        with self._lock:
+            if self._frame is None:
+                frames = [self._load(market) for market in MARKETS]
+                self._dirty.clear()
+            elif self._dirty:
+                changed = set().union(*self._dirty.values())
+                frames = [self._frame[~self._frame["code"].isin(changed)]]
+                frames += [self._load(market, sorted(codes)) for market, codes in self._dirty.items()]
+                self._dirty.clear()
+            else:
+                return self._frame, self._dates
+            frame = pd.concat(frames, ignore_index=True)
+            # 同代號出現在多個市場時以 MARKETS 順序優先
+            rank = frame["market"].map({market: i for i, market in enumerate(MARKETS)})
+            frame = frame.assign(_rank=rank).sort_values(["date", "code", "_rank"], kind="stable")
+            frame = frame.drop_duplicates(subset=["date", "code"]).drop(columns="_rank").reset_index(drop=True)
+            self._frame = frame
+            self._dates = frame["date"].to_numpy()
+            return self._frame, self._dates
+
+    def on(self, date: pd.Timestamp) -> pd.DataFrame:
+        frame, dates = self.frame()
+        lo = dates.searchsorted(date.to_datetime64(), side="left")
+        hi = dates.searchsorted(date.to_datetime64(), side="right")
+        return frame.iloc[lo:hi]
+
+
+# === 回應快取 ===
+# 鍵包含資料的世代（檔案 mtime 或異動計數），資料一變鍵就不同，舊的項目由 LRU 淘汰。
+class ResponseCache:
+    def __init__(self, entries=CACHE_ENTRIES):
+        self.entries = entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, item):
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# === 編碼 ===
+def encode(frame: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    frame = frame.copy()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.strftime("%Y-%m-%d")
+    return frame.to_json(orient="split", index=False, force_ascii=False).encode("utf-8")
+
+
+class Payload:
+    # 一份查詢結果的各種表示；gzip 版本第一次需要時才產生
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self._gzipped = None
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=5)
+        return self._gzipped
+
+
+# === 資料服務 ===
+class DataService:
+    def __init__(self, watch: bool = True):
+        self.cache = ResponseCache()
+        self.cross_section = CrossSectionStore()
+        self._stop = threading.Event()
+        self._watcher = None
+        if watch:
+            self._feed = ChangeFeed("data_service")
+            # 啟動時快取是空的，既有的異動紀錄不需要處理
+            self._feed.read()
+            self._feed.commit()
+            self._watcher = threading.Thread(target=self._watch, daemon=True)
+            self._watcher.start()
+
+    # --- 爬蟲寫檔 → 快取失效 ---
+    def _watch(self):
+        while not self._stop.wait(POLL_SECONDS):
+            try:
+                records = self._feed.read()
+                if records:
+                    self.apply_changes(records)
+                self._feed.commit()
+            except Exception as e:
+                print(f"⚠️ 讀取異動紀錄失敗: {e}")
+
+    def apply_changes(self, records):
+        # 單檔歷史與股票清單的快取鍵本身就含檔案 mtime；這裡只需要處理全市場截面
+        dirs = {info["dir"]: market for market, info in MARKETS.items()}
+        touched = {}
+        for record in records:
+            folder, _, code = record["table"].rpartition("/")
+            if folder in dirs:
+                touched.setdefault(dirs[folder], set()).add(code)
+        for market, codes in touched.items():
+            self.cross_section.invalidate(market, codes)
+
+    def close(self):
+        self._stop.set()
+
+    # --- 查詢 ---
+    def history(self, code, params):
+        if not code.isalnum():
+            raise BadRequest(f"股票代號格式錯誤：{code}")
+        market = params.get("market")
+        if market is not None and market not in MARKETS:
+            raise BadRequest(f"未知的市場：{market}")
+        market = market or find_market(code)
+        if market is None or not os.path.exists(history_path(market, code)):
+            raise NotFound(f"找不到股票 {code} 的歷史資料")
+        stat = os.stat(history_path(market, code))
+        key = ("history", code, market, params.get("start"), params.get("end"), stat.st_mtime_ns, stat.st_size)
+
+        def build():
+            frame = load_history(code, market)
+            start, end = parse_date(params.get("start")), parse_date(params.get("end"))
+            if start is not None:
+                frame = frame[frame["date"] >= start]
+            if end is not None:
+                frame = frame[frame["date"] <= end]
+            return frame[NORMALIZED_COLUMNS]
+
+        return key, build
+
+    def cross(self, date_text, params):
+        date = parse_date(date_text)
+        if date is None:
+            raise BadRequest("需要日期，例如 /cross-section/2025-08-22")
+        market = params.get("market")
+        if market is not None and market not in MARKETS:
+            raise BadRequest(f"未知的市場：{market}")
+        key = ("cross", date, market, self.cross_section.generation)
+
+        def build():
+            frame = self.cross_section.on(date)
+            if market is not None:
+                frame = frame[frame["market"] == market]
+            return frame
+
+        return key, build
+
+    def quotes(self, params):
+        paths = [os.path.join(DATA_DIR, info["master"]) for info in MARKETS.values()]
+        signature = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else 0 for path in paths)
+        market = params.get("market")
+        if market is not None and market not in MARKETS:
+            raise BadRequest(f"未知的市場：{market}")
+        codes = params.get("codes")
+        key = ("quotes", market, codes, signature)
+
+        def build():
+            frame = load_universe([market] if market is not None else None)
+            frame = frame[[column for column in QUOTE_COLUMNS if column in frame.columns]]
+            if codes:
+                frame = frame[frame["股票代號"].isin(codes.split(","))]
+            return frame.reset_index(drop=True)
+
+        return key, build
+
+    def resolve(self, path, params):
+        parts = [unquote(part) for part in path.strip("/").split("/") if part]
+        if parts[:1] == ["history"] and len(parts) == 2:
+            return self.history(parts[1], params)
+        if parts[:1] == ["cross-section"] and len(parts) == 2:
+            return self.cross(parts[1], params)
+        if parts == ["quotes"]:
+            return self.quotes(params)
+        raise NotFound(f"未知的路徑：{path}")
+
+    def payload(self, path, params) -> Payload:
+        fmt = params.get("format", "json")
+        if fmt not in ("json", "arrow"):
+            raise BadRequest("format 只接受 json 或 arrow")
+        key, build = self.resolve(path, params)
+        key = key + (fmt,)
+        payload = self.cache.get(key)
+        if payload is None:
+            payload = Payload(encode(build(), fmt), ARROW_TYPE if fmt == "arrow" else "application/json; charset=utf-8")
+            self.cache.put(key, payload)
+        return payload
+
+
+def parse_date(text):
+    if not text:
+        return None
+    try:
+        return pd.Timestamp(text)
+    except ValueError:
+        raise BadRequest(f"無法解析日期：{text}")
+
+
+# === HTTP 處理 ===
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive，省掉每個請求重新建立連線
+    disable_nagle_algorithm = True  # 表頭與內容分兩次寫出，不關掉 Nagle 會和延遲 ACK 卡住約 40 ms
+    service: DataService = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == "/health":
+            cache = self.service.cache
+            self._send(200, json.dumps({"status": "ok", "hits": cache.hits, "misses": cache.misses}).encode(),
+                       "application/json")
+            return
+        try:
+            payload = self.service.payload(url.path, params)
+        except NotFound as e:
+            self._error(404, str(e))
+            return
+        except BadRequest as e:
+            self._error(400, str(e))
+            return
+        except Exception as e:
+            # 資料檔損毀、pandas 解析錯誤等：記錄下來並回 500，不讓連線沒有回應
+            print(f"❌ {self.path} 處理失敗：{e!r}")
+            traceback.print_exc()
+            self._error(500, "伺服器內部錯誤")
+            return
+
+        if self.headers.get("If-None-Match") == payload.etag:
+            self._send(304, b"", None, payload.etag)
+            return
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "") and len(payload.body) >= GZIP_MIN_BYTES
+        body = payload.gzipped() if use_gzip else payload.body
+        self._send(200, body, payload.content_type, payload.etag, "gzip" if use_gzip else None)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({"error": message}, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _send(self, status, body, content_type, etag=None, encoding=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, watch=True):
+    service = DataService(watch=watch)
+    handler = type("BoundHandler", (Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="本機唯讀資料服務：歷史價格、全市場截面、最新報價")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--no-watch", action="store_true", help="不追蹤爬蟲異動紀錄")
+    parser.add_argument("--warm", action="store_true", help="啟動時先載入全市場截面")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server, service = make_server(args.host, args.port, watch=not args.no_watch)
+    if args.warm:
+        start = time.perf_counter()
+        service.cross_section.frame()
+        print(f"全市場截面已載入（{time.perf_counter() - start:.1f} 秒）")
+    print(f"✅ 資料服務啟動：http://{args.host}:{args.port}/  （/history/<代號>、/cross-section/<日期>、/quotes）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
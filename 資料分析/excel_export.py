@@ -0,0 +1,275 @@
+import os
+import sys
+import csv
+import time
+import argparse
+from datetime import datetime
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+EXPORT_DIR = os.path.join(PROJECT_ROOT, "data", "exports")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 共用工具.xlsx_stream import (
+    SHEET_ROW_LIMIT, STYLE_DATE, STYLE_INT, STYLE_PERCENT, STYLE_PRICE,
+    XlsxStreamWriter, cell_number, cell_string,
+)
+from 資料分析.history_store import DATA_DIR, MARKETS, history_path, list_codes, load_histories, load_universe
+
+# === 匯出參數 ===
+CHUNK_BYTES = 2 << 20       # 每次從歷史資料讀入的原始 CSV 總大小；記憶體用量只跟這個有關，與總列數無關
+MARKET_LABELS = {"listed": "上市", "otc": "上櫃", "emerging": "興櫃"}
+UNCLASSIFIED = "未分類"
+EXCEL_EPOCH = np.datetime64("1899-12-30", "ns")
+
+HISTORY_HEADER = ["股票代號", "股票名稱", "日期", "開盤價", "最高價", "最低價", "收盤價", "成交股數", "成交金額", "成交筆數"]
+HISTORY_VALUES = ["open", "high", "low", "close", "volume", "turnover", "trades"]
+HISTORY_STYLES = [STYLE_PRICE] * 4 + [STYLE_INT] * 3
+HISTORY_WIDTHS = [10, 14, 12, 10, 10, 10, 10, 16, 18, 10]
+UNIVERSE_WIDTHS = {"股票名稱": 14, "上市日": 12, "產業別": 16, "鉅亨網網址": 40}
+
+
+# === 工作表分派 ===
+# 每個市場或產業一張工作表；超過 Excel 列數上限時自動接續到「名稱 (2)」。
+# 各工作表分別串流到自己的暫存檔，因此不同分組的資料可以交錯寫入。
+class SheetRouter:
+    def __init__(self, writer: XlsxStreamWriter, header, widths):
+        self.writer = writer
+        self.header = header
+        self.widths = widths
+        self._sheets = {}
+        self.rows = 0
+
+    def next_row(self, key):
+        sheet = self._sheets.get(key)
+        if sheet is None or sheet.rows >= SHEET_ROW_LIMIT:
+            sheet = self._sheets[key] = self.writer.add_sheet(key, self.header, self.widths)
+        self.rows += 1
+        return sheet, sheet.next_row()
+
+
+# === 歷史價格（依市場或產業分表） ===
+def _batches(market, codes, chunk_bytes):
+    # 依檔案大小切批，歷史較長的檔案一批放得比較少
+    batch, size = [], 0
+    for code in codes:
+        batch.append(code)
+        size += os.path.getsize(history_path(market, code))
+        if size >= chunk_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def iter_history_chunks(markets, codes=None, start=None, end=None, chunk_bytes=CHUNK_BYTES):
+    # 一次只讀約 chunk_bytes 的檔案，產生 (market, 長表格)；同代號出現在多個市場時以 MARKETS 順序優先
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    wanted = set(codes) if codes is not None else None
+    seen = set()
+    for market in markets:
+        selected = [code for code in list_codes(market) if code not in seen and (wanted is None or code in wanted)]
+        seen.update(selected)
+        for batch in _batches(market, selected, chunk_bytes):
+            chunk = load_histories(market, batch)
+            if start is not None:
+                chunk = chunk[chunk["date"] >= start]
+            if end is not None:
+                chunk = chunk[chunk["date"] <= end]
+            if not chunk.empty:
+                yield market, chunk
+
+
+def export_history(path, group_by="market", markets=None, codes=None, start=None, end=None):
+    markets = list(markets or MARKETS)
+    universe = load_universe(markets).set_index("股票代號")
+    names = {code: escape(name) for code, name in universe["股票名稱"].fillna("").str.strip().items()}
+    industries = universe["產業別"].fillna("").str.strip().replace("", UNCLASSIFIED).to_dict()
+
+    writer = XlsxStreamWriter(path)
+    router = SheetRouter(writer, HISTORY_HEADER, HISTORY_WIDTHS)
+    try:
+        for market, chunk in iter_history_chunks(markets, codes, start, end):
+            # 日期先整批轉成 Excel 序號、數值整批轉成 list，逐列只剩字串組合
+            serials = ((chunk["date"].to_numpy(dtype="datetime64[ns]") - EXCEL_EPOCH) / np.timedelta64(1, "D")).tolist()
+            values = chunk[HISTORY_VALUES].to_numpy(dtype="float64").tolist()
+            label = MARKET_LABELS[market]
+            for code, serial, row_values in zip(chunk["code"].tolist(), serials, values):
+                key = label if group_by == "market" else industries.get(code, UNCLASSIFIED)
+                sheet, row = router.next_row(key)
+                cells = [
+                    cell_string(f"A{row}", escape(code)),
+                    cell_string(f"B{row}", names.get(code, "")),
+                    cell_number(f"C{row}", serial, STYLE_DATE),
+                ]
+                # NaN（沒有成交）留白
+                cells.extend(
+                    cell_number(f"{letter}{row}", value, style)
+                    for letter, value, style in zip("DEFGHIJ", row_values, HISTORY_STYLES)
+                    if value == value
+                )
+                sheet.write_row_xml(row, "".join(cells))
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    return router.rows
+
+
+# === 股票清單（直接以 csv 模組逐列串流） ===
+def _number(text):
+    try:
+        return float(text.replace(",", "").replace("+", ""))
+    except ValueError:
+        return None
+
+
+def _date_serial(text):
+    try:
+        return (datetime.strptime(text, "%Y/%m/%d") - datetime(1899, 12, 30)).days
+    except ValueError:
+        return None
+
+
+def universe_cell(ref, name, text):
+    # 股票代號維持文字（0050、00679B 不可變成數字）；日期、價格、漲跌幅轉成可計算的儲存格
+    value = None
+    if name == "上市日":
+        value, style = _date_serial(text), STYLE_DATE
+    elif name in ("價格", "漲跌"):
+        value, style = _number(text), STYLE_PRICE
+    elif name.startswith("漲跌幅度") and text.endswith("%"):
+        value, style = _number(text[:-1]), STYLE_PERCENT
+        value = value / 100 if value is not None else None
+    if value is None:
+        return cell_string(ref, escape(text))
+    return cell_number(ref, value, style)
+
+
+def export_universe(path, group_by="market", markets=None):
+    writer = XlsxStreamWriter(path)
+    router = None
+    try:
+        for market in markets or MARKETS:
+            source = os.path.join(DATA_DIR, MARKETS[market]["master"])
+            if not os.path.exists(source):
+                continue
+            with open(source, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if not header:
+                    continue
+                if router is None:
+                    router = SheetRouter(writer, header, [UNIVERSE_WIDTHS.get(name, 10) for name in header])
+                group_col = header.index("產業別") if group_by == "industry" and "產業別" in header else None
+
+                for values in reader:
+                    if not values:
+                        continue
+                    if group_col is None:
+                        key = MARKET_LABELS[market]
+                    else:
+                        key = (values[group_col].strip() if group_col < len(values) else "") or UNCLASSIFIED
+                    sheet, row = router.next_row(key)
+                    cells = "".join(
+                        universe_cell(f"{sheet.letters[col]}{row}", name, text.strip())
+                        for col, (name, text) in enumerate(zip(header, values))
+                        if text.strip()
+                    )
+                    sheet.write_row_xml(row, cells)
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    return router.rows if router is not None else 0
+
+
+# === 多本活頁簿（可平行產生） ===
+def export_job(job):
+    start = time.perf_counter()
+    if job["kind"] == "universe":
+        rows = export_universe(job["path"], job["group_by"], job.get("markets"))
+    else:
+        rows = export_history(
+            job["path"], job["group_by"], job.get("markets"), job.get("codes"), job.get("start"), job.get("end")
+        )
+    return {"path": job["path"], "rows": rows, "seconds": time.perf_counter() - start}
+
+
+def history_jobs(out_dir, group_by="market", markets=None, start=None, end=None, split_by="none", codes=None):
+    # split_by：none 一本、market 每個市場一本、year 每個年度一本
+    markets = list(markets or MARKETS)
+    base = {"kind": "history", "group_by": group_by, "codes": codes}
+    if split_by == "market":
+        return [
+            dict(base, markets=[m], start=start, end=end, path=os.path.join(out_dir, f"history_{m}.xlsx"))
+            for m in markets
+        ]
+    if split_by == "year":
+        first = pd.Timestamp(start).year if start else 2000
+        last = pd.Timestamp(end).year if end else datetime.now().year
+        jobs = []
+        for year in range(first, last + 1):
+            lo = max(pd.Timestamp(f"{year}-01-01"), pd.Timestamp(start)) if start else f"{year}-01-01"
+            hi = min(pd.Timestamp(f"{year}-12-31"), pd.Timestamp(end)) if end else f"{year}-12-31"
+            jobs.append(dict(base, markets=markets, start=lo, end=hi, path=os.path.join(out_dir, f"history_{year}.xlsx")))
+        return jobs
+    return [dict(base, markets=markets, start=start, end=end, path=os.path.join(out_dir, f"history_{group_by}.xlsx"))]
+
+
+def run_jobs(jobs, workers=1):
+    # 每本活頁簿由一個行程獨立寫入，彼此不共用狀態
+    if workers <= 1 or len(jobs) <= 1:
+        return [export_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(export_job, jobs))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="以串流方式把歷史價格與股票清單匯出成 Excel（固定記憶體）")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    p = sub.add_parser("history", help="匯出日成交歷史，每個市場或產業一張工作表")
+    p.add_argument("--group-by", choices=["market", "industry"], default="market")
+    p.add_argument("--markets", nargs="*", choices=sorted(MARKETS))
+    p.add_argument("--codes", nargs="*", help="只匯出指定股票代號")
+    p.add_argument("--start", help="起始日期，例如 2024-01-01")
+    p.add_argument("--end")
+    p.add_argument("--split-by", choices=["none", "market", "year"], default="none", help="拆成多本活頁簿")
+    p.add_argument("--workers", type=int, default=1, help="同時產生幾本活頁簿")
+    p.add_argument("--out-dir", default=EXPORT_DIR)
+
+    p = sub.add_parser("universe", help="匯出股票清單（含最新報價），每個市場或產業一張工作表")
+    p.add_argument("--group-by", choices=["market", "industry"], default="market")
+    p.add_argument("--markets", nargs="*", choices=sorted(MARKETS))
+    p.add_argument("--out", default=os.path.join(EXPORT_DIR, "universe.xlsx"))
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "universe":
+        jobs = [{"kind": "universe", "group_by": args.group_by, "markets": args.markets, "path": args.out}]
+        workers = 1
+    else:
+        jobs = history_jobs(args.out_dir, args.group_by, args.markets, args.start, args.end, args.split_by, args.codes)
+        workers = args.workers
+
+    start = time.perf_counter()
+    results = run_jobs(jobs, workers)
+    elapsed = time.perf_counter() - start
+    total = sum(result["rows"] for result in results)
+    for result in results:
+        print(f"✅ {result['path']}：{result['rows']:,} 列，{result['seconds']:.1f} 秒")
+    print(f"共 {total:,} 列，{elapsed:.1f} 秒（{total / max(elapsed, 1e-9):,.0f} 列/秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import io
+import os
+import pickle
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
+# === 各市場的歷史資料夾與股票清單 ===
+MARKETS = {
+    "listed": {"dir": "list_company_stock_data", "master": "list_company_number.csv"},
+    "otc": {"dir": "over_the_counter_data", "master": "over_the_counter_number.csv"},
+    "emerging": {"dir": "emerging_stock_data", "master": "emerging_stock_market.csv"},
+}
+
+# === 欄位對應 ===
+# 三支日成交爬蟲存下的欄位名稱不一致（上市資料夾內也混有興櫃格式），
+# 依欄位名稱而非市場來判斷，同一欄位有多個來源時依序補值。
+# 單位：櫃買的「成交張數」是張（1,000 股）、「成交仟元」是千元。
+COLUMN_SOURCES = {
+    "open": [("開盤價", 1), ("開盤", 1)],
+    "high": [("最高價", 1), ("最高", 1), ("成交最高", 1)],
+    "low": [("最低價", 1), ("最低", 1), ("成交最低", 1)],
+    "close": [("收盤價", 1), ("收盤", 1), ("成交均價", 1)],
+    "volume": [("成交股數", 1), ("成交張數", 1000)],
+    "turnover": [("成交金額", 1), ("成交仟元", 1000)],
+    "trades": [("成交筆數", 1), ("筆數", 1)],
+}
+NORMALIZED_COLUMNS = ["date", "open", "high", "low", "close", "volume", "turnover", "trades"]
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+
+# === 日期轉換 ===
+def parse_dates(values: pd.Series) -> pd.Series:
+    # 民國 114/08/22 與西元 2025-08-22 兩種格式都接受
+    text = values.str.strip()
+    parts = text.str.extract(r"^(\d{2,3})/(\d{1,2})/(\d{1,2})$").astype(float)
+    roc = pd.to_datetime(
+        pd.DataFrame({"year": parts[0] + 1911, "month": parts[1], "day": parts[2]}),
+        errors="coerce",
+    )
+    ad = pd.to_datetime(text.where(roc.isna()).str[:10], format="%Y-%m-%d", errors="coerce")
+    return roc.fillna(ad)
+
+
+def to_number(values: pd.Series) -> pd.Series:
+    # 去掉千分位，「--」「X」等標記轉成 NaN
+    return pd.to_numeric(values.str.replace(",", "", regex=False), errors="coerce")
+
+
+# === 正規化 ===
+# raw 為全字串欄位；可以是單一檔案，也可以是多個同格式檔案串接（多一個 code 欄位）。
+# 全部以整欄向量運算處理，逐檔呼叫時成本主要在 read_csv。
+def normalize_history(raw: pd.DataFrame) -> pd.DataFrame:
+    raw = raw.rename(columns=lambda name: name.strip().lstrip("\ufeff"))
+    date_col = "日 期" if "日 期" in raw.columns else "日期"
+    result = pd.DataFrame(index=raw.index)
+    if "code" in raw.columns:
+        result["code"] = raw["code"]
+    result["date"] = parse_dates(raw[date_col].fillna(""))
+
+    for column, sources in COLUMN_SOURCES.items():
+        values = None
+        for source, scale in sources:
+            if source not in raw.columns:
+                continue
+            converted = to_number(raw[source].fillna("")).astype("float64") * scale
+            values = converted if values is None else values.fillna(converted)
+        result[column] = values if values is not None else float("nan")
+
+    # 沒有成交的日子價格記為 0 或 --，一律視為缺值
+    prices = result[PRICE_COLUMNS]
+    traded = result["volume"].fillna(0) > 0
+    result[PRICE_COLUMNS] = prices.where((prices > 0) & traded.to_numpy()[:, None])
+
+    keys = ["code", "date"] if "code" in result.columns else ["date"]
+    # 同一天重複出現時保留檔案中較前面（較新抓取）的那一列
+    result = result.dropna(subset=["date"]).drop_duplicates(subset=keys, keep="first")
+    return result.sort_values(keys, ignore_index=True)
+
+
+# === 檔案位置 ===
+def history_dir(market: str) -> str:
+    return os.path.join(DATA_DIR, MARKETS[market]["dir"])
+
+
+def history_path(market: str, code: str) -> str:
+    return os.path.join(history_dir(market), f"{code}.csv")
+
+
+def list_codes(market: str):
+    folder = history_dir(market)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name[:-4] for name in os.listdir(folder) if name.endswith(".csv"))
+
+
+def find_market(code: str):
+    for market in MARKETS:
+        if os.path.exists(history_path(market, code)):
+            return market
+    return None
+
+
+# === 讀取單一股票（正規化後，日期由舊到新） ===
+def load_history(code: str, market: str = None) -> pd.DataFrame:
+    market = market or find_market(code)
+    if market is None:
+        raise FileNotFoundError(f"找不到股票 {code} 的歷史資料")
+    raw = pd.read_csv(history_path(market, code), encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    if raw.empty:
+        return pd.DataFrame(columns=NORMALIZED_COLUMNS)
+    return normalize_history(raw)[NORMALIZED_COLUMNS]
+
+
+# === 批次讀取（長表格：code, date, ...） ===
+# 逐檔 read_csv 的固定成本遠大於解析本身，因此把同一種表頭的檔案
+# 串成一個大字串、前面加上 code 欄，一次交給 C parser 後再整批正規化。
+def load_histories(market: str, codes=None) -> pd.DataFrame:
+    folder = history_dir(market)
+    groups = {}
+    for code in codes if codes is not None else list_codes(market):
+        path = os.path.join(folder, f"{code}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8-sig") as f:
+            header = f.readline().strip()
+            body = f.read()
+        if not header or not body.strip():
+            continue
+        lines = groups.setdefault(header, [])
+        lines.extend(f"{code},{line}" for line in body.splitlines() if line.strip())
+
+    frames = []
+    for header, lines in groups.items():
+        buffer = io.StringIO(f"code,{header}\n" + "\n".join(lines))
+        raw = pd.read_csv(buffer, dtype=str, keep_default_na=False)
+        frames.append(normalize_history(raw))
+
+    if not frames:
+        return pd.DataFrame(columns=["code"] + NORMALIZED_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values(["code", "date"], ignore_index=True)
+
+
+# === 讀取股票清單（含市場別、產業別與報價欄位） ===
+def load_universe(markets=None) -> pd.DataFrame:
+    frames = []
+    for market in markets or MARKETS:
+        path = os.path.join(DATA_DIR, MARKETS[market]["master"])
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path, encoding="utf-8-sig", dtype=str)
+        df["market"] = market
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["股票代號", "股票名稱", "市場別", "產業別", "market"])
+    universe = pd.concat(frames, ignore_index=True)
+    universe["股票代號"] = universe["股票代號"].str.strip()
+    return universe.drop_duplicates(subset=["股票代號"], keep="first").reset_index(drop=True)
+
+
+# === 全市場欄位面板（日期 x 股票代號） ===
+def _files_signature(markets):
+    signature = []
+    for market in markets:
+        folder = history_dir(market)
+        for code in list_codes(market):
+            stat = os.stat(os.path.join(folder, f"{code}.csv"))
+            signature.append((market, code, stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def load_panel(field: str = "close", markets=None, use_cache: bool = True) -> pd.DataFrame:
+    # 同一代號若同時出現在多個市場（例如興櫃轉上市），以 MARKETS 的順序優先
+    markets = list(markets or MARKETS)
+    signature = _files_signature(markets)
+    cache_path = os.path.join(CACHE_DIR, f"panel_{field}_{'_'.join(markets)}.pkl")
+
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if cached["signature"] == signature:
+            return cached["panel"]
+
+    frames = []
+    seen = set()
+    for market in markets:
+        codes = [code for m, code, _, _ in signature if m == market and code not in seen]
+        seen.update(codes)
+        frames.append(load_histories(market, codes)[["code", "date", field]])
+
+    long = pd.concat(frames, ignore_index=True)
+    panel = long.pivot(index="date", columns="code", values=field).sort_index().astype("float32")
+    panel.columns.name = None
+
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, "wb") as f:
+            pickle.dump({"signature": signature, "panel": panel}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return panel
+
+
+def load_close_panel(markets=None, use_cache: bool = True) -> pd.DataFrame:
+    return load_panel("close", markets, use_cache)
@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+AGG_DIR = os.path.join(PROJECT_ROOT, "data", "aggregates")
+STATE_PATH = os.path.join(AGG_DIR, "state.json")
+SHARES_PATH = os.path.join(PROJECT_ROOT, "data", "shares_outstanding.csv")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 資料分析.history_store import MARKETS, history_path, list_codes, load_histories, load_universe
+
+# === 物化檢視 ===
+# 每張表以 (date, group) 為鍵，只存可相加的統計量，新資料進來時直接加總合併；
+# 平均報酬等比值在查詢時才由統計量算出。
+VIEWS = {
+    "industry": "產業別",
+    "market": "市場別",
+}
+MARKET_LABELS = {"listed": "上市", "otc": "上櫃", "emerging": "興櫃"}
+UNCLASSIFIED = "未分類"
+SUM_COLUMNS = ["turnover", "volume", "n", "advancers", "decliners", "unchanged", "sum_ret", "sum_wret", "sum_w"]
+STATE_VERSION = 2               # 狀態檔格式；版本不符時整批重建
+GROUP_FIELDS = {"industry": "industry", "market": "market_label"}  # 各檢視的分組存在狀態檔的哪個欄位
+
+
+def view_path(view: str) -> str:
+    return os.path.join(AGG_DIR, f"{view}_daily.csv")
+
+
+# === 狀態檔 ===
+def empty_state():
+    return {"version": STATE_VERSION, "weight_basis": None, "codes": {}}
+
+
+def load_state():
+    if not os.path.exists(STATE_PATH):
+        return empty_state()
+    with open(STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(AGG_DIR, exist_ok=True)
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, STATE_PATH)
+
+
+def file_signature(market: str, code: str):
+    stat = os.stat(history_path(market, code))
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def rows_digest(rows: pd.DataFrame) -> str:
+    # 已計入彙總的那段歷史的指紋：中間補進缺漏的日子或改寫舊價格時都會改變
+    hashed = pd.util.hash_pandas_object(rows[["date", "close", "volume", "turnover"]], index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()[:16]
+
+
+# === 權重 ===
+# 有 data/shares_outstanding.csv（股票代號, 發行股數）時以前一日市值加權；
+# 沒有發行股數資料時退而以前一日成交金額加權，並記錄在狀態檔的 weight_basis，查詢結果也帶著這個欄位。
+WEIGHT_LABELS = {"market_cap": "前一日市值", "turnover": "前一日成交金額"}
+
+
+def load_shares():
+    if not os.path.exists(SHARES_PATH):
+        return None
+    df = pd.read_csv(SHARES_PATH, encoding="utf-8-sig", dtype=str)
+    shares = pd.to_numeric(df.iloc[:, 1].str.replace(",", "", regex=False), errors="coerce")
+    return pd.Series(shares.to_numpy(), index=df.iloc[:, 0].str.strip())
+
+
+# === 單檔的貢獻量 ===
+def contributions(history: pd.DataFrame, groups: pd.DataFrame, shares, seeds=None) -> dict:
+    # history：長表格（code, date, close, volume, turnover），每檔日期由舊到新
+    # seeds：code -> (前一筆有效收盤, 前一日成交金額)，接續上次處理到的位置
+    df = history[["code", "date", "close", "volume", "turnover"]].copy()
+    by_code = df.groupby("code", sort=False)
+    # 前一筆「有成交」的收盤價：冷門股中間沒成交的日子沿用最後成交價
+    df["prev_close"] = by_code["close"].ffill().groupby(df["code"], sort=False).shift()
+    df["prev_turnover"] = by_code["turnover"].shift()
+
+    if seeds:
+        first = ~df["code"].duplicated()
+        seed_close = df.loc[first, "code"].map(lambda c: seeds.get(c, (None, None))[0])
+        seed_turnover = df.loc[first, "code"].map(lambda c: seeds.get(c, (None, None))[1])
+        df.loc[first, "prev_close"] = pd.to_numeric(seed_close, errors="coerce")
+        df.loc[first, "prev_turnover"] = pd.to_numeric(seed_turnover, errors="coerce")
+        # 新資料開頭幾天沒成交時，也要沿用種子收盤價
+        df["prev_close"] = df.groupby("code", sort=False)["prev_close"].ffill()
+
+    ret = df["close"] / df["prev_close"] - 1
+    has_ret = ret.notna()
+    if shares is not None:
+        weight = df["code"].map(shares) * df["prev_close"]
+    else:
+        weight = df["prev_turnover"]
+    weight = weight.where(has_ret & (weight > 0))
+
+    df["n"] = has_ret.astype(int)
+    df["advancers"] = (ret > 0).astype(int)
+    df["decliners"] = (ret < 0).astype(int)
+    df["unchanged"] = (ret == 0).astype(int)
+    df["sum_ret"] = ret.fillna(0)
+    df["sum_wret"] = (ret * weight).fillna(0)
+    df["sum_w"] = weight.fillna(0)
+    df["turnover"] = df["turnover"].fillna(0)
+    df["volume"] = df["volume"].fillna(0)
+
+    df = df.join(groups, on="code")
+    result = {}
+    for view, column in VIEWS.items():
+        result[view] = (
+            df.groupby(["date", column], sort=False)[SUM_COLUMNS].sum()
+            .rename_axis(["date", "group"])
+        )
+    return result
+
+
+def merge_into(tables: dict, delta: dict, sign: int = 1):
+    for view, frame in delta.items():
+        frame = frame * sign
+        current = tables.get(view)
+        tables[view] = frame if current is None else current.add(frame, fill_value=0)
+
+
+# === 讀寫物化表 ===
+def read_view(view: str) -> pd.DataFrame:
+    path = view_path(view)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, encoding="utf-8-sig", parse_dates=["date"], dtype={"group": str})
+    return df.set_index(["date", "group"])
+
+
+def write_view(view: str, table: pd.DataFrame):
+    os.makedirs(AGG_DIR, exist_ok=True)
+    # 移除完全歸零的列（例如整檔重算時被扣掉的舊貢獻）
+    table = table[(table[SUM_COLUMNS] != 0).any(axis=1)].sort_index()
+    tmp = view_path(view) + ".tmp"
+    table.reset_index().to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, view_path(view))
+
+
+# === 增量更新 ===
+# 每檔記錄已計入的日期範圍 [first, last] 與這段資料的指紋：
+# - 只在 last 之後新增：以上次的收盤價接續，只累加新列
+# - 只在 first 之前回補：扣掉原本的貢獻（舊列都還在檔案裡）後整檔重算
+# - 範圍內的資料有變動（補進缺漏的日子、改寫舊價格）：舊值已不在檔案裡無法扣除，
+#   改為把這檔所屬的分組以組內所有股票的完整歷史整組重算
+def update(rebuild: bool = False):
+    state = empty_state() if rebuild else load_state()
+    if state.get("version") != STATE_VERSION:
+        if state["codes"]:
+            print("⚠️ 彙總狀態檔格式已變更，改為整批重建")
+        state = empty_state()
+        rebuild = True
+    shares = load_shares()
+    weight_basis = "market_cap" if shares is not None else "turnover"
+    if state["weight_basis"] not in (None, weight_basis):
+        # 權重基準改變時舊的加權統計量不能沿用
+        print(f"⚠️ 權重基準由 {state['weight_basis']} 改為 {weight_basis}，改為整批重建")
+        state = empty_state()
+        rebuild = True
+    state["weight_basis"] = weight_basis
+
+    universe = load_universe().set_index("股票代號")
+    tables = {} if rebuild else {view: read_view(view) for view in VIEWS}
+    tables = {view: table for view, table in tables.items() if table is not None}
+    dirty = {view: set() for view in VIEWS}
+    changed_codes = 0
+
+    for market in MARKETS:
+        changed = []
+        for code in list_codes(market):
+            info = state["codes"].get(code)
+            if info is not None and info["market"] != market:
+                continue  # 同代號已由優先市場處理
+            if info is None or info["signature"] != file_signature(market, code):
+                changed.append(code)
+        if not changed:
+            continue
+
+        history = load_histories(market, changed)
+        groups = pd.DataFrame({
+            "產業別": [_group_value(universe, code, "產業別", UNCLASSIFIED) for code in changed],
+            "市場別": [_group_value(universe, code, "市場別", MARKET_LABELS[market]) for code in changed],
+        }, index=pd.Index(changed, name="code"))
+
+        appended, rebuilt, seeds = [], [], {}
+        for code, rows in history.groupby("code", sort=False):
+            info = state["codes"].get(code)
+            if info is None:
+                rebuilt.append(code)
+                continue
+            first, last = pd.Timestamp(info["first"]), pd.Timestamp(info["last"])
+            old = rows[(rows["date"] >= first) & (rows["date"] <= last)]
+            if rows_digest(old) != info["digest"]:
+                for view, field in GROUP_FIELDS.items():
+                    dirty[view].update((info[field], groups.at[code, VIEWS[view]]))
+            elif rows["date"].iloc[0] < first:
+                # 回補了更早的資料：先扣掉這檔原本的貢獻再整檔重算
+                old_groups = pd.DataFrame({"產業別": [info["industry"]], "市場別": [info["market_label"]]}, index=[code])
+                merge_into(tables, contributions(old, old_groups, shares), sign=-1)
+                rebuilt.append(code)
+            else:
+                appended.append(code)
+                seeds[code] = (info["last_close"], info["last_turnover"])
+
+        full = history[history["code"].isin(rebuilt)]
+        if not full.empty:
+            merge_into(tables, contributions(full, groups, shares))
+        if appended:
+            last_seen = {code: pd.Timestamp(state["codes"][code]["last"]) for code in appended}
+            new_rows = history[history["code"].isin(appended)]
+            new_rows = new_rows[new_rows["date"] > new_rows["code"].map(last_seen)]
+            if not new_rows.empty:
+                merge_into(tables, contributions(new_rows, groups, shares, seeds))
+
+        for code, rows in history.groupby("code", sort=False):
+            closes = rows["close"].dropna()
+            state["codes"][code] = {
+                "market": market,
+                "signature": file_signature(market, code),
+                "first": rows["date"].iloc[0].strftime("%Y-%m-%d"),
+                "last": rows["date"].iloc[-1].strftime("%Y-%m-%d"),
+                "digest": rows_digest(rows),
+                "last_close": float(closes.iloc[-1]) if not closes.empty else None,
+                "last_turnover": _float_or_none(rows["turnover"].iloc[-1]),
+                "industry": groups.at[code, "產業別"],
+                "market_label": groups.at[code, "市場別"],
+            }
+        changed_codes += len(changed)
+
+    if any(dirty.values()):
+        # 狀態檔已更新為各檔現在的分組，整組重算時以此決定成員
+        recompute_groups(tables, state, dirty, shares)
+        names = "、".join(sorted(set().union(*dirty.values())))
+        print(f"🔁 已計入的歷史資料有變動，整組重算：{names}")
+
+    for view, table in tables.items():
+        write_view(view, table)
+    save_state(state)
+    _VIEW_CACHE.clear()
+    print(f"✅ 產業/市場彙總已更新：{changed_codes} 檔有新資料")
+    return changed_codes
+
+
+def recompute_groups(tables: dict, state: dict, dirty: dict, shares):
+    # 丟掉這些分組的既有列，再以組內所有股票的完整歷史重新累加
+    for view, table in tables.items():
+        if dirty[view]:
+            tables[view] = table[~table.index.get_level_values("group").isin(dirty[view])]
+
+    members = {}
+    for code, info in state["codes"].items():
+        if any(info[field] in dirty[view] for view, field in GROUP_FIELDS.items()):
+            members.setdefault(info["market"], []).append(code)
+
+    for market, codes in members.items():
+        groups = pd.DataFrame(
+            {VIEWS[view]: [state["codes"][code][field] for code in codes] for view, field in GROUP_FIELDS.items()},
+            index=pd.Index(codes, name="code"),
+        )
+        delta = contributions(load_histories(market, codes), groups, shares)
+        merge_into(tables, {
+            view: frame[frame.index.get_level_values("group").isin(dirty[view])] for view, frame in delta.items()
+        })
+
+
+def _group_value(universe, code, column, default):
+    if code in universe.index:
+        value = universe.at[code, column]
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return default
+
+
+def _float_or_none(value):
+    return None if pd.isna(value) else float(value)
+
+
+# === 查詢（直接讀物化表，記憶體內以 (group, date) 排序索引切片） ===
+_VIEW_CACHE = {}
+
+
+def _indexed_view(view: str) -> pd.DataFrame:
+    path = view_path(view)
+    mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    cached = _VIEW_CACHE.get(view)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    table = read_view(view)
+    if table is None:
+        raise FileNotFoundError(f"尚未建立 {view} 彙總表，請先執行 update()")
+    table = table.swaplevel().sort_index()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["ew_return"] = table["sum_ret"] / table["n"]
+        # 加權報酬的權重依 weight_basis：market_cap（前一日市值）或 turnover（前一日成交金額）
+        table["w_return"] = table["sum_wret"] / table["sum_w"]
+    table["breadth"] = table["advancers"] - table["decliners"]
+    table["weight_basis"] = load_state().get("weight_basis")
+    _VIEW_CACHE[view] = (mtime, table)
+    return table
+
+
+def query(view: str, group: str = None, start=None, end=None) -> pd.DataFrame:
+    table = _indexed_view(view)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    if group is not None:
+        if group not in table.index.get_level_values(0):
+            return table.iloc[0:0]
+        return table.loc[group].loc[start:end]
+    return table.loc[(slice(None), slice(start, end)), :]
+
+
+def groups(view: str):
+    return _indexed_view(view).index.get_level_values(0).unique().tolist()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="產業別 / 市場別每日彙總（成交金額、漲跌家數、等權與加權報酬）")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    p = sub.add_parser("update", help="增量更新物化表")
+    p.add_argument("--rebuild", action="store_true", help="捨棄既有結果整批重建")
+
+    p = sub.add_parser("query", help="查詢物化表")
+    p.add_argument("view", choices=sorted(VIEWS))
+    p.add_argument("--group", help="產業別或市場別，例如 半導體業、上櫃")
+    p.add_argument("--start")
+    p.add_argument("--end")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "update":
+        update(rebuild=args.rebuild)
+        return
+    result = query(args.view, args.group, args.start, args.end)
+    columns = ["turnover", "advancers", "decliners", "unchanged", "breadth", "ew_return", "w_return"]
+    basis = result["weight_basis"].iloc[0] if len(result) else None
+    print(f"加權報酬（w_return）權重：{WEIGHT_LABELS.get(basis, '未知')}")
+    print(result[columns].to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "analysis")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 資料分析.history_store import load_close_panel, load_universe, to_number
+
+# === 預設參數 ===
+DEFAULT_DAYS = 500              # 歷史模擬使用的交易日數
+DEFAULT_LEVELS = (0.95, 0.99)
+CHUNK_PORTFOLIOS = 2000         # 每個工作單位處理的投資組合數，P&L 矩陣大小為 chunk x days
+
+
+# === 投資組合（稀疏持股矩陣：投資組合 x 股票，值為股數） ===
+def portfolio_matrix(positions: pd.DataFrame, codes):
+    # positions 欄位：portfolio, code, quantity；同一組合同一股票重複出現時股數相加
+    index = pd.Index(codes)
+    column = index.get_indexer(positions["code"].astype(str).str.strip())
+    known = column >= 0
+    portfolio_ids, row = np.unique(positions["portfolio"].astype(str).to_numpy(), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (positions["quantity"].to_numpy(dtype="float64")[known], (row[known], column[known])),
+        shape=(len(portfolio_ids), len(index)),
+    )
+    matrix.sum_duplicates()
+    unknown = positions.loc[~known, "code"].astype(str).unique().tolist()
+    return portfolio_ids, matrix, unknown
+
+
+def load_positions(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, encoding="utf-8-sig", dtype={"portfolio": str, "code": str})
+    missing = {"portfolio", "code", "quantity"} - set(df.columns)
+    if missing:
+        raise ValueError(f"持股檔缺少欄位：{', '.join(sorted(missing))}")
+    return df
+
+
+# === 市場資料 ===
+def quote_prices(codes) -> np.ndarray:
+    # 股票清單的「價格」欄（報價爬蟲寫入）；「-」或空白為 NaN
+    universe = load_universe().set_index("股票代號")
+    if "價格" not in universe.columns:
+        return np.full(len(codes), np.nan)
+    prices = to_number(universe["價格"].fillna("").astype(str))
+    return prices.reindex(pd.Index(codes)).to_numpy(dtype="float64")
+
+
+def return_panel(days: int = DEFAULT_DAYS, markets=None) -> pd.DataFrame:
+    # 最近 days 個交易日的簡單報酬（日期 x 股票）；沒有成交的日子沿用前一收盤價，報酬記為 0
+    close = load_close_panel(markets).astype("float64")
+    close = close.iloc[-(days + 1):].ffill()
+    returns = close.pct_change().iloc[1:]
+    return returns.fillna(0.0)
+
+
+# === 計算核心 ===
+def tail_metrics(losses: np.ndarray, levels):
+    # losses：組合 x 情境的損失矩陣；一次 partition 取得各信賴水準的 VaR 與 ES
+    n = losses.shape[1]
+    ks = [min(n - 1, max(0, int(np.ceil(level * n)) - 1)) for level in levels]
+    ordered = np.partition(losses, sorted(set(ks)), axis=1)
+    result = {}
+    for level, k in zip(levels, ks):
+        tail = ordered[:, k:]
+        tag = f"{level * 100:g}"
+        result[f"var_{tag}"] = ordered[:, k]
+        # 第 k 名之後在 partition 後都 >= VaR，但彼此未排序，直接平均即為 ES
+        result[f"es_{tag}"] = tail.mean(axis=1)
+    return result
+
+
+def evaluate_chunk(quantities, prices, returns, levels):
+    # quantities：稀疏 組合 x 股票；prices：股票；returns：股票 x 情境（已轉置、補 0）
+    priced = np.nan_to_num(prices)
+    exposure = quantities.multiply(priced).tocsr()              # 每個部位的市值
+    value = np.asarray(exposure.sum(axis=1)).ravel()
+    held = quantities.copy()
+    held.data = np.ones_like(held.data)
+    missing = np.asarray(held @ np.isnan(prices).astype("float64")).ravel()
+
+    pnl = np.asarray(exposure @ returns)                         # 組合 x 情境的損益
+    metrics = tail_metrics(-pnl, levels)
+    metrics["value"] = value
+    metrics["missing_prices"] = missing.astype(int)
+    metrics["worst_loss"] = -pnl.min(axis=1) if pnl.shape[1] else np.full(len(value), np.nan)
+    return metrics
+
+
+# === 平行處理：市場資料只在每個工作行程初始化時傳一次 ===
+_WORKER = {}
+
+
+def _init_worker(prices, returns, levels):
+    _WORKER.update(prices=prices, returns=returns, levels=levels)
+
+
+def _run_chunk(quantities):
+    return evaluate_chunk(quantities, _WORKER["prices"], _WORKER["returns"], _WORKER["levels"])
+
+
+def evaluate(quantities, prices, returns, levels=DEFAULT_LEVELS, workers=1, chunk=CHUNK_PORTFOLIOS):
+    # returns 為 情境 x 股票 的 ndarray；回傳與 quantities 列順序相同的指標字典
+    returns_t = np.ascontiguousarray(np.asarray(returns, dtype="float64").T)
+    chunks = [quantities[i:i + chunk] for i in range(0, quantities.shape[0], chunk)]
+    if workers <= 1 or len(chunks) <= 1:
+        parts = [evaluate_chunk(part, prices, returns_t, levels) for part in chunks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)), initializer=_init_worker, initargs=(prices, returns_t, levels)
+        ) as pool:
+            parts = list(pool.map(_run_chunk, chunks))
+    if not parts:
+        return {}
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def portfolio_risk(positions: pd.DataFrame, days=DEFAULT_DAYS, levels=DEFAULT_LEVELS, workers=1, markets=None):
+    returns = return_panel(days, markets)
+    codes = returns.columns.tolist()
+    portfolio_ids, quantities, unknown = portfolio_matrix(positions, codes)
+    if unknown:
+        print(f"⚠️ {len(unknown)} 個代號沒有歷史資料，已略過：{', '.join(unknown[:10])}")
+    if len(returns) < days:
+        print(f"⚠️ 歷史資料只有 {len(returns)} 個交易日（要求 {days} 日）")
+
+    metrics = evaluate(quantities, quote_prices(codes), returns.to_numpy(), levels, workers)
+    result = pd.DataFrame(metrics, index=pd.Index(portfolio_ids, name="portfolio"))
+    ordered = ["value", "missing_prices"] + [c for c in result.columns if c.startswith(("var_", "es_"))] + ["worst_loss"]
+    return result[ordered]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="批次投資組合市值與歷史模擬 VaR / ES")
+    parser.add_argument("positions", help="持股 CSV（欄位：portfolio, code, quantity；quantity 為股數）")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="歷史模擬的交易日數")
+    parser.add_argument("--levels", type=float, nargs="+", default=list(DEFAULT_LEVELS))
+    parser.add_argument("--workers", type=int, default=1, help="平行計算的行程數")
+    parser.add_argument("--markets", nargs="*", choices=["listed", "otc", "emerging"])
+    parser.add_argument("--out", help="輸出 CSV 路徑，預設 data/analysis/portfolio_risk.csv")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    result = portfolio_risk(load_positions(args.positions), args.days, tuple(args.levels), args.workers, args.markets)
+    out = args.out or os.path.join(OUTPUT_DIR, "portfolio_risk.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    result.to_csv(out, encoding="utf-8-sig")
+    print(f"✅ {len(result):,} 個投資組合已輸出至 {out}（{time.perf_counter() - start:.1f} 秒）")
+
+
+if __name__ == "__main__":
+    main()
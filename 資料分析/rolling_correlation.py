@@ -0,0 +1,291 @@
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "analysis")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from 資料分析.history_store import load_close_panel
+
+# 輸出矩陣或統計量超過這個大小就改寫到 memmap
+DEFAULT_MEMORY_LIMIT = 1 << 30
+DTYPE = np.float32
+
+
+# === 報酬率 ===
+def compute_returns(close_panel: pd.DataFrame) -> pd.DataFrame:
+    # 對數報酬；前一個交易日或當日沒有成交價者為 NaN，不跨缺口補值
+    log_close = np.log(close_panel.astype("float64"))
+    return log_close.diff().astype(DTYPE)
+
+
+# === 滾動相關係數引擎 ===
+# 缺值以「成對完整觀測」處理：視窗內兩檔都有報酬的日子才計入。
+# 令 X 為補 0 的報酬、M 為有值遮罩（皆為 視窗天數 x 檔數），則所有成對統計量都是矩陣乘積：
+#   n   = M'M        成對有效天數
+#   S1  = X'M        S1[i, j] = i 在 i、j 都有值的日子的報酬和（S1' 即 j 的和）
+#   S2  = (X*X)'M    同上的平方和
+#   P   = X'X        交叉乘積和
+# 視窗前進一天時，四個統計量都只需要一次 rank-2 更新（加新的一天、減掉最舊的一天），
+# 成本 O(N^2)，而不是每天重算 O(W * N^2)。float32 累加會漂移，因此每隔 refresh_every 天整窗重算一次。
+class RollingCorrelation:
+    def __init__(self, codes, window=60, min_periods=None, block_size=512,
+                 memory_limit=DEFAULT_MEMORY_LIMIT, spill_dir=None, refresh_every=120):
+        self.codes = list(codes)
+        self.n_codes = len(self.codes)
+        self.window = window
+        self.min_periods = min_periods or max(2, window // 2)
+        self.block_size = block_size
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir or os.path.join(OUTPUT_DIR, "spill")
+        self.refresh_every = refresh_every
+        self._spill = None
+
+        # 視窗內的原始資料用環狀緩衝保存，供移除最舊一天與定期重算使用
+        self._x = np.zeros((window, self.n_codes), dtype=DTYPE)
+        self._m = np.zeros((window, self.n_codes), dtype=DTYPE)
+        self._pos = 0
+        self._filled = 0
+        self._since_refresh = 0
+        self.last_date = None
+
+        stats_bytes = 4 * self.n_codes * self.n_codes * np.dtype(DTYPE).itemsize
+        spill = stats_bytes > memory_limit
+        self._n = self._allocate("n", spill)
+        self._s1 = self._allocate("s1", spill)
+        self._s2 = self._allocate("s2", spill)
+        self._p = self._allocate("p", spill)
+
+    def _allocate(self, name, spill):
+        shape = (self.n_codes, self.n_codes)
+        if not spill:
+            return np.zeros(shape, dtype=DTYPE)
+        array = np.lib.format.open_memmap(self._spill_path(f"stats_{name}"), mode="w+", dtype=DTYPE, shape=shape)
+        array[:] = 0
+        return array
+
+    # === 暫存檔 ===
+    # 每個引擎在 spill_dir 下各自建一個暫存目錄，同時執行的計算不會互相覆寫；close() 時整個刪除
+    def _spill_path(self, name):
+        if self._spill is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill = tempfile.TemporaryDirectory(prefix="corr_", dir=self.spill_dir, ignore_cleanup_errors=True)
+        return os.path.join(self._spill.name, f"{name}.npy")
+
+    def close(self):
+        # 未指定 out_path 時 matrix() 回傳的 memmap 也在暫存目錄裡，close() 之後不能再使用
+        self._n = self._s1 = self._s2 = self._p = None
+        if self._spill is not None:
+            self._spill.cleanup()
+            self._spill = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _blocks(self):
+        for start in range(0, self.n_codes, self.block_size):
+            yield start, min(start + self.block_size, self.n_codes)
+
+    # === 整窗重算 ===
+    def _recompute(self):
+        x, m = self._x, self._m
+        x2 = x * x
+        # 以列區塊計算，每次只產生 block_size x N 的結果，寫入（可能是 memmap 的）統計量
+        for i0, i1 in self._blocks():
+            xi, mi, x2i = x[:, i0:i1], m[:, i0:i1], x2[:, i0:i1]
+            self._n[i0:i1] = mi.T @ m
+            self._s1[i0:i1] = xi.T @ m
+            self._s2[i0:i1] = x2i.T @ m
+            self._p[i0:i1] = xi.T @ x
+        self._since_refresh = 0
+
+    # === 增量更新 ===
+    def _rank_update(self, add_x, add_m, drop_x=None, drop_m=None):
+        # 把「加一天、減一天」合成 U @ V 形式的低秩更新：U 為 N x k、V 為 k x N
+        if drop_x is None:
+            ux, um, ux2 = add_x[:, None], add_m[:, None], (add_x * add_x)[:, None]
+            vx, vm = add_x[None, :], add_m[None, :]
+        else:
+            ux = np.stack([add_x, drop_x], axis=1)
+            um = np.stack([add_m, drop_m], axis=1)
+            ux2 = ux * ux
+            vx = np.stack([add_x, -drop_x])
+            vm = np.stack([add_m, -drop_m])
+        for i0, i1 in self._blocks():
+            self._n[i0:i1] += um[i0:i1] @ vm
+            self._s1[i0:i1] += ux[i0:i1] @ vm
+            self._s2[i0:i1] += ux2[i0:i1] @ vm
+            self._p[i0:i1] += ux[i0:i1] @ vx
+
+    def push(self, returns_row, date=None):
+        row = np.asarray(returns_row, dtype=DTYPE)
+        mask = np.isfinite(row).astype(DTYPE)
+        row = np.where(mask > 0, row, 0).astype(DTYPE)
+
+        if self._filled < self.window:
+            drop_x = drop_m = None
+            self._filled += 1
+        else:
+            drop_x = self._x[self._pos].copy()
+            drop_m = self._m[self._pos].copy()
+
+        self._x[self._pos] = row
+        self._m[self._pos] = mask
+        self._pos = (self._pos + 1) % self.window
+        self._since_refresh += 1
+        self.last_date = date
+
+        if self._since_refresh >= self.refresh_every:
+            self._recompute()
+        else:
+            self._rank_update(row, mask, drop_x, drop_m)
+
+    def fit(self, returns: pd.DataFrame):
+        # 直接以最後 window 天建立初始狀態（一次整窗計算，不逐日累加）
+        tail = returns.iloc[-self.window:]
+        values = tail.to_numpy(dtype=DTYPE)
+        mask = np.isfinite(values)
+        count = len(tail)
+        self._x[:] = 0
+        self._m[:] = 0
+        self._x[:count] = np.where(mask, values, 0)
+        self._m[:count] = mask
+        self._filled = count
+        self._pos = count % self.window
+        self.last_date = tail.index[-1] if count else None
+        self._recompute()
+        return self
+
+    # === 由統計量計算相關係數 ===
+    def _corr_block(self, i0, i1):
+        n = self._n[i0:i1]
+        sx = self._s1[i0:i1]
+        sy = self._s1[:, i0:i1].T
+        sxx = self._s2[i0:i1]
+        syy = self._s2[:, i0:i1].T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = n * self._p[i0:i1] - sx * sy
+            var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+            corr = cov / np.sqrt(var)
+        corr[(n < self.min_periods) | ~(var > 0)] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        return corr, n
+
+    def matrix(self, out_path=None):
+        shape = (self.n_codes, self.n_codes)
+        nbytes = self.n_codes * self.n_codes * np.dtype(DTYPE).itemsize
+        if out_path is None and nbytes > self.memory_limit:
+            out_path = self._spill_path("corr")
+        if out_path is not None:
+            out = np.lib.format.open_memmap(out_path, mode="w+", dtype=DTYPE, shape=shape)
+        else:
+            out = np.empty(shape, dtype=DTYPE)
+
+        for i0, i1 in self._blocks():
+            out[i0:i1], _ = self._corr_block(i0, i1)
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    def top_k(self, k=10, absolute=False) -> pd.DataFrame:
+        # 逐區塊挑出每檔相關係數最高的 k 檔，不必產生完整矩陣
+        codes = np.asarray(self.codes)
+        k = min(k, self.n_codes - 1)
+        frames = []
+        # 只有一檔（或 k <= 0）時沒有可比較的對象
+        for i0, i1 in (self._blocks() if k > 0 else ()):
+            corr, n = self._corr_block(i0, i1)
+            score = np.abs(corr) if absolute else corr.copy()
+            score[np.arange(i1 - i0), np.arange(i0, i1)] = np.nan
+            score = np.nan_to_num(score, nan=-np.inf)
+
+            idx = np.argpartition(-score, k - 1, axis=1)[:, :k]
+            rows = np.repeat(np.arange(i1 - i0), k)
+            cols = idx.ravel()
+            valid = np.isfinite(score[rows, cols])
+            rows, cols = rows[valid], cols[valid]
+            frames.append(pd.DataFrame({
+                "code": codes[i0 + rows],
+                "peer": codes[cols],
+                "corr": corr[rows, cols],
+                "n_obs": n[rows, cols].astype(int),
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=["code", "peer", "corr", "n_obs"])
+        result = pd.concat(frames, ignore_index=True)
+        order_key = result["corr"].abs() if absolute else result["corr"]
+        result = result.assign(_key=order_key).sort_values(["code", "_key"], ascending=[True, False])
+        return result.drop(columns="_key").reset_index(drop=True)
+
+
+# === 逐日滾動 ===
+def rolling_correlations(close_panel: pd.DataFrame, window=60, start=None, **kwargs):
+    # 產生 (日期, 引擎)；引擎狀態每天只做增量更新，呼叫端自行取 matrix() 或 top_k()
+    returns = compute_returns(close_panel)
+    start_loc = returns.index.searchsorted(pd.Timestamp(start)) if start is not None else window
+    start_loc = max(start_loc, 1)
+
+    engine = RollingCorrelation(returns.columns, window=window, **kwargs)
+    engine.fit(returns.iloc[:start_loc])
+    values = returns.to_numpy(dtype=DTYPE)
+    for loc in range(start_loc, len(returns)):
+        engine.push(values[loc], returns.index[loc])
+        yield returns.index[loc], engine
+
+
+def latest_correlation(window=60, markets=None, min_coverage=0.0, **kwargs):
+    closes = load_close_panel(markets)
+    if min_coverage > 0:
+        coverage = closes.iloc[-window:].notna().mean()
+        closes = closes.loc[:, coverage >= min_coverage]
+    returns = compute_returns(closes)
+    return RollingCorrelation(returns.columns, window=window, **kwargs).fit(returns)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="計算全市場滾動報酬相關係數（完整矩陣或每檔前 k 名）")
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--min-periods", type=int, default=None)
+    parser.add_argument("--markets", nargs="*", choices=["listed", "otc", "emerging"])
+    parser.add_argument("--min-coverage", type=float, default=0.0, help="視窗內有成交天數比例低於此值的股票排除")
+    parser.add_argument("--top-k", type=int, default=10, help="每檔輸出前 k 名；0 表示輸出完整矩陣")
+    parser.add_argument("--absolute", action="store_true", help="依相關係數絕對值排名")
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--out", default=None)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with latest_correlation(
+        window=args.window, markets=args.markets, min_coverage=args.min_coverage,
+        min_periods=args.min_periods, block_size=args.block_size,
+    ) as engine:
+        if engine.last_date is None:
+            print("⚠️ 沒有可用的收盤價資料，未輸出相關係數")
+            return
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+        if args.top_k > 0:
+            out = args.out or os.path.join(OUTPUT_DIR, f"corr_top{args.top_k}_w{args.window}.csv")
+            engine.top_k(args.top_k, absolute=args.absolute).to_csv(out, index=False, encoding="utf-8-sig")
+        else:
+            out = args.out or os.path.join(OUTPUT_DIR, f"corr_w{args.window}.npy")
+            engine.matrix(out_path=out)
+            pd.Series(engine.codes).to_csv(out[:-4] + "_codes.csv", index=False, header=["code"], encoding="utf-8-sig")
+        print(f"✅ 相關係數已輸出至 {out}（{engine.n_codes} 檔，截至 {engine.last_date:%Y-%m-%d}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import os
+import sys
+import csv
+import time
+import pickle
+import argparse
+from collections import defaultdict
+
+# === 路徑設定 ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+INDEX_PATH = os.path.join(DATA_DIR, "cache", "symbol_index.pkl")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# 查詢只需要標準函式庫；pandas 只有在更新成交金額排名時才載入
+INDEX_VERSION = 1
+LOOKBACK_DAYS = 20              # 以最近幾個交易日的平均成交金額排序
+MAX_PREFIX = 6                  # 股票代號前綴最多索引到幾碼
+MASTER_FILES = {
+    "listed": "list_company_number.csv",
+    "otc": "over_the_counter_number.csv",
+    "emerging": "emerging_stock_market.csv",
+}
+
+
+# === 索引鍵 ===
+# p:<代號前綴>、c:<名稱單字>、b:<名稱相鄰兩字>；每個鍵對應一串依成交金額排序的代號。
+# 查詢時取最短的一串依序走訪，再以其他鍵的集合過濾，走到 limit 筆就停，不需要排序。
+def name_grams(name: str):
+    name = name.replace(" ", "").upper()
+    grams = {f"c:{ch}" for ch in name}
+    grams.update(f"b:{name[i:i + 2]}" for i in range(len(name) - 1))
+    return grams
+
+
+def entry_keys(code: str, name: str):
+    keys = name_grams(name)
+    keys.update(f"p:{code[:n].upper()}" for n in range(1, min(len(code), MAX_PREFIX) + 1))
+    return keys
+
+
+def query_keys(text: str):
+    text = text.replace(" ", "").upper()
+    if len(text) == 1:
+        return [f"c:{text}"]
+    return [f"b:{text[i:i + 2]}" for i in range(len(text) - 1)]
+
+
+# === 來源檔 ===
+def master_signature(path: str):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def read_master(market: str):
+    # 回傳 {代號: (名稱, 市場, 產業別)}；同代號重複時保留第一筆
+    path = os.path.join(DATA_DIR, MASTER_FILES[market])
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            code = (row.get("股票代號") or "").strip()
+            if code and code not in entries:
+                entries[code] = ((row.get("股票名稱") or "").strip(), market, (row.get("產業別") or "").strip())
+    return entries
+
+
+def recent_turnover(codes):
+    from 資料分析.history_store import load_panel
+
+    panel = load_panel("turnover")
+    average = panel.tail(LOOKBACK_DAYS).mean()
+    return {code: float(average.get(code, 0.0) or 0.0) for code in codes}
+
+
+# === 索引 ===
+class SymbolIndex:
+    def __init__(self):
+        self.sources = {}           # market -> 來源檔簽章
+        self.entries = {}           # code -> (name, market, industry)
+        self.turnover = {}          # code -> 近期日均成交金額
+        self.postings = {}          # key -> [code, ...]（依排名）
+        self._sets = {}
+        self._industries = defaultdict(set)
+
+    # --- 排名 ---
+    def _rank_key(self, code):
+        return (-self.turnover.get(code, 0.0), code)
+
+    def _resort(self, keys):
+        for key in keys:
+            codes = self.postings.get(key)
+            if not codes:
+                self.postings.pop(key, None)
+                self._sets.pop(key, None)
+                continue
+            codes.sort(key=self._rank_key)
+            self._sets[key] = set(codes)
+
+    def _rebuild_lookups(self):
+        self._sets = {key: set(codes) for key, codes in self.postings.items()}
+        self._industries = defaultdict(set)
+        for code, (_, _, industry) in self.entries.items():
+            self._industries[industry].add(code)
+
+    # --- 增量更新：清單檔有變動時重新比對，只改動新增、刪除或改名的代號 ---
+    def refresh_sources(self) -> int:
+        signatures = {market: master_signature(os.path.join(DATA_DIR, name)) for market, name in MASTER_FILES.items()}
+        if signatures == self.sources:
+            return 0
+        # 三份清單合計只有數千列，整份重讀很便宜；成本在於重建鍵值，因此只處理有變動的代號
+        fresh = {}
+        for market in MASTER_FILES:
+            for code, entry in read_master(market).items():
+                fresh.setdefault(code, entry)  # 同代號出現在多個市場時以 MASTER_FILES 順序優先
+
+        touched = set()
+        changed = 0
+        for code in self.entries.keys() - fresh.keys():
+            touched |= self._remove(code)
+            changed += 1
+        for code, entry in fresh.items():
+            old = self.entries.get(code)
+            if old == entry:
+                continue
+            if old is not None:
+                touched |= self._remove(code)
+            touched |= self._add(code, entry)
+            changed += 1
+        self.sources = signatures
+        self._resort(touched)
+        return changed
+
+    def _add(self, code, entry):
+        self.entries[code] = entry
+        self._industries[entry[2]].add(code)
+        keys = entry_keys(code, entry[0])
+        for key in keys:
+            self.postings.setdefault(key, []).append(code)
+        return keys
+
+    def _remove(self, code):
+        name, _, industry = self.entries.pop(code)
+        self._industries[industry].discard(code)
+        keys = entry_keys(code, name)
+        for key in keys:
+            codes = self.postings.get(key)
+            if codes and code in codes:
+                codes.remove(code)
+        return keys
+
+    def refresh_turnover(self):
+        self.turnover = recent_turnover(list(self.entries))
+        self._resort(list(self.postings))
+
+    # --- 查詢 ---
+    def lookup(self, text: str, industry: str = None, market: str = None, limit: int = 10):
+        # 代號前綴與名稱 n-gram 的結果合併：代號前綴優先，其餘依成交金額排序
+        text = (text or "").strip()
+        allowed = self._industries.get(industry, set()) if industry else None
+        results = []
+        seen = set()
+
+        def accept(code):
+            if code in seen or (allowed is not None and code not in allowed):
+                return False
+            if market is not None and self.entries[code][1] != market:
+                return False
+            seen.add(code)
+            results.append(code)
+            return len(results) >= limit
+
+        if not text:
+            pool = sorted(allowed, key=self._rank_key) if allowed is not None else sorted(self.entries, key=self._rank_key)
+            for code in pool:
+                if accept(code):
+                    break
+            return [self.describe(code) for code in results]
+
+        if text.isascii() and len(text) <= MAX_PREFIX:
+            for code in self.postings.get(f"p:{text.upper()}", ()):
+                if accept(code):
+                    return [self.describe(code) for code in results]
+
+        keys = query_keys(text)
+        lists = [self.postings.get(key) for key in keys]
+        if all(lists):
+            shortest = min(lists, key=len)
+            others = [self._sets[key] for key in keys if self.postings[key] is not shortest]
+            for code in shortest:
+                if all(code in other for other in others) and accept(code):
+                    break
+        return [self.describe(code) for code in results]
+
+    def describe(self, code):
+        name, market, industry = self.entries[code]
+        return {"code": code, "name": name, "market": market, "industry": industry,
+                "turnover": self.turnover.get(code, 0.0)}
+
+    # --- 存檔 ---
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        state = {
+            "version": INDEX_VERSION, "sources": self.sources, "entries": self.entries,
+            "turnover": self.turnover, "postings": self.postings,
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        index = cls()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == INDEX_VERSION:
+                index.sources = state["sources"]
+                index.entries = state["entries"]
+                index.turnover = state["turnover"]
+                index.postings = state["postings"]
+                index._rebuild_lookups()
+        return index
+
+
+# === 對外介面 ===
+_INDEX = None
+
+
+def update(turnover: bool = True, rebuild: bool = False) -> SymbolIndex:
+    # 股票清單更新後呼叫；turnover=False 時沿用上次的成交金額排名
+    global _INDEX
+    index = SymbolIndex() if rebuild else SymbolIndex.load()
+    changed = index.refresh_sources()
+    if turnover or rebuild:
+        index.refresh_turnover()
+    index.save()
+    _INDEX = index
+    print(f"✅ 股票搜尋索引已更新：{len(index.entries)} 檔，{changed} 檔有異動")
+    return index
+
+
+def get_index() -> SymbolIndex:
+    # 清單檔有變動時自動增量更新（不重算成交金額排名）
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = SymbolIndex.load()
+    if _INDEX.refresh_sources():
+        _INDEX.save()
+    return _INDEX
+
+
+def lookup(text: str, industry: str = None, market: str = None, limit: int = 10):
+    return get_index().lookup(text, industry, market, limit)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="股票代號 / 名稱搜尋索引")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    p = sub.add_parser("update", help="增量更新索引並重算成交金額排名")
+    p.add_argument("--rebuild", action="store_true", help="捨棄既有索引整個重建")
+
+    p = sub.add_parser("find", help="查詢股票，例如 find 台積、find 23、find 富味")
+    p.add_argument("text", nargs="?", default="")
+    p.add_argument("--industry")
+    p.add_argument("--market", choices=sorted(MASTER_FILES))
+    p.add_argument("--limit", type=int, default=10)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.action == "update":
+        update(rebuild=args.rebuild)
+        return
+    index = get_index()
+    start = time.perf_counter()
+    results = index.lookup(args.text, args.industry, args.market, args.limit)
+    elapsed = (time.perf_counter() - start) * 1e6
+    for item in results:
+        print(f"{item['code']:<8} {item['name']:<12} {item['market']:<9} {item['industry'] or '-':<12} {item['turnover']:>16,.0f}")
+    print(f"共 {len(results)} 筆（{elapsed:.0f} µs）")
+
+
+if __name__ == "__main__":
+    main()